@@ -0,0 +1,310 @@
+"""
+Local stand-in for the OpenAI Responses API (POST /v1/responses).
+
+Replays recorded payloads from bench/fixtures with configurable latency,
+token rate, error rate and malformed-JSON rate, in both regular and
+streaming (SSE) mode. Used by bench/run_bench.py; can also be run on its own:
+
+    python bench/mock_server.py --port 8765 --latency-ms 800
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python research.py
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+CHARS_PER_TOKEN = 4  # rough, good enough for usage numbers and pacing
+
+
+# ----------------- CONFIG -----------------
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 500.0  # time before the first token
+    latency_jitter: float = 0.3  # +/- fraction applied to latency_ms
+    tokens_per_second: float = 200.0  # output pacing; 0 = instant
+    error_rate: float = 0.0  # fraction of requests answered with a 5xx/429
+    malformed_rate: float = 0.0  # fraction of concept JSON payloads that are broken
+    web_search_calls: int = 2  # web_search_call items reported when tools are present
+    seed: Optional[int] = None
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def quality(name: str) -> int:
+    return int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:8], 16) % 1000
+
+
+# ----------------- SERVER -----------------
+
+
+class MockResponsesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.rng_lock = threading.Lock()
+        self.memo = load_fixture("memo.md")
+        self.concepts = load_fixture("concepts.json")
+        self.seen_prefixes: set = set()
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "malformed": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients hang up mid-response when a hedged request loses; not an error.
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def roll(self, rate: float) -> bool:
+        with self.rng_lock:
+            return self.rng.random() < rate
+
+    def jitter(self) -> float:
+        with self.rng_lock:
+            return 1.0 + self.rng.uniform(-self.config.latency_jitter, self.config.latency_jitter)
+
+    def cached_tokens(self, prompt: str) -> int:
+        """
+        Simulates provider prefix caching: the longest 1024-token-aligned
+        prefix seen before counts as cached.
+        """
+        block = 1024 * CHARS_PER_TOKEN
+        cached = 0
+        with self.rng_lock:
+            for end in range(block, len(prompt) + 1, block):
+                digest = hashlib.sha1(prompt[:end].encode("utf-8")).hexdigest()
+                if digest in self.seen_prefixes:
+                    cached = end
+                else:
+                    self.seen_prefixes.add(digest)
+        return cached // CHARS_PER_TOKEN
+
+    def pick_output(self, body: Dict[str, Any]) -> str:
+        prompt = body.get("input") if isinstance(body.get("input"), str) else json.dumps(body.get("input"))
+        # Ranking: a hidden, stable "quality" per concept name drives both
+        # first-pass scores and pairwise verdicts.
+        if body.get("prompt_cache_key") == "rank_score":
+            ids = re.findall(r"^\[id (\d+)\] (.*)$", prompt, re.MULTILINE)
+            return json.dumps({"scores": [{"id": int(i), "score": 1 + quality(name) % 10} for i, name in ids]})
+        if body.get("prompt_cache_key") == "rank_judge":
+            a, b = re.findall(r"^Concept [AB]: (.*)$", prompt, re.MULTILINE)[-2:]
+            return json.dumps({"winner": "A" if quality(a) >= quality(b) else "B"})
+        if body.get("prompt_cache_key") == "memo_compress":
+            # Condensed memo section: keep the first third of it.
+            section = prompt.split("Section:\n", 1)[-1]
+            return section.partition("\n")[2][: len(section) // 3]
+        if body.get("prompt_cache_key") == "memo_refresh":
+            # Re-researched memo section: every other one is unchanged, the
+            # rest get their first figure bumped and one new bullet.
+            section = prompt.split("):\n", 1)[-1]
+            if quality(section) % 2:
+                return "UNCHANGED"
+            text = section.partition("\n")[2]
+            text = re.sub(r"\d+", lambda m: str(int(m.group()) + 1), text, count=1)
+            return text + "\n- **Update.** A new entrant announced a competing product this month."
+        wants_json = "Respond ONLY" in prompt or "valid JSON" in prompt
+        if not wants_json:
+            return self.memo
+
+        # Fan-out mode: outline call, then one expansion call per concept.
+        tail = prompt[-3000:]
+        if "outline only" in tail:
+            concepts = json.loads(self.concepts)["concepts"]
+            return json.dumps({"concepts": [{"name": c["name"], "thesis": c["problem"]} for c in concepts]}, indent=2)
+        if "ONLY this one concept" in tail:
+            concepts = json.loads(self.concepts)["concepts"]
+            match = next((c for c in concepts if f"Name: {c['name']}\n" in tail), concepts[0])
+            return json.dumps({"concepts": [match]}, indent=2)
+        # The JSON-repair pass always gets a clean answer.
+        if body.get("prompt_cache_key") != "json_repair" and self.roll(self.config.malformed_rate):
+            with self.rng_lock:
+                self.stats["malformed"] += 1
+            return self.concepts[: len(self.concepts) * 2 // 3]  # truncated mid-object
+        return self.concepts
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: MockResponsesServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # keep benchmark output clean
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        if not self.path.rstrip("/").endswith("/responses"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "not_found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", "0"))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        cfg = server.config
+        with server.rng_lock:
+            server.stats["requests"] += 1
+
+        time.sleep(cfg.latency_ms / 1000.0 * server.jitter())
+
+        if server.roll(cfg.error_rate):
+            with server.rng_lock:
+                server.stats["errors"] += 1
+            status = 429 if server.roll(0.5) else 503
+            self._send_json(status, {"error": {"message": "mock overload", "type": "server_error"}})
+            return
+
+        prompt = body.get("input") if isinstance(body.get("input"), str) else json.dumps(body.get("input"))
+        text = server.pick_output(body)
+        usage = {
+            "input_tokens": len(prompt) // CHARS_PER_TOKEN,
+            "input_tokens_details": {"cached_tokens": server.cached_tokens(prompt)},
+            "output_tokens": len(text) // CHARS_PER_TOKEN,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": (len(prompt) + len(text)) // CHARS_PER_TOKEN,
+        }
+        searches = cfg.web_search_calls if body.get("tools") else 0
+        response = build_response(body.get("model", "mock"), text, usage, searches)
+
+        if body.get("stream"):
+            self._stream(response, text)
+        else:
+            if cfg.tokens_per_second > 0:
+                time.sleep(usage["output_tokens"] / cfg.tokens_per_second)
+            self._send_json(200, response)
+
+    def _stream(self, response: Dict[str, Any], text: str) -> None:
+        cfg = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        seq = 0
+
+        def send(event: Dict[str, Any]) -> None:
+            nonlocal seq
+            event["sequence_number"] = seq
+            seq += 1
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        in_progress = dict(response, status="in_progress", output=[])
+        send({"type": "response.created", "response": in_progress})
+
+        item_id = response["output"][-1]["id"]
+        chunk_chars = 8 * CHARS_PER_TOKEN
+        delay = (8 / cfg.tokens_per_second) if cfg.tokens_per_second > 0 else 0.0
+        for i in range(0, len(text), chunk_chars):
+            send(
+                {
+                    "type": "response.output_text.delta",
+                    "item_id": item_id,
+                    "output_index": len(response["output"]) - 1,
+                    "content_index": 0,
+                    "delta": text[i : i + chunk_chars],
+                    "logprobs": [],
+                }
+            )
+            if delay:
+                time.sleep(delay)
+
+        send({"type": "response.completed", "response": response})
+
+
+def build_response(model: str, text: str, usage: Dict[str, Any], web_search_calls: int) -> Dict[str, Any]:
+    output: List[Dict[str, Any]] = [
+        {"type": "web_search_call", "id": f"ws_{uuid.uuid4().hex}", "status": "completed", "action": {"type": "search", "query": "mock"}}
+        for _ in range(web_search_calls)
+    ]
+    output.append(
+        {
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }
+    )
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": usage,
+    }
+
+
+def start_mock_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> MockResponsesServer:
+    """
+    Starts the mock server on a background thread; port 0 picks a free port.
+    Call .shutdown() when done.
+    """
+    server = MockResponsesServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI Responses API server for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=MockConfig.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--malformed-rate", type=float, default=MockConfig.malformed_rate)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    server = MockResponsesServer((args.host, args.port), config)
+    print(f"Mock Responses API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
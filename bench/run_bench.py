@@ -0,0 +1,167 @@
+"""
+Offline pipeline benchmark against the local mock Responses API.
+
+Drives run_research_for_oz (sequentially) and run_batch (at several
+concurrency levels) against bench/mock_server.py, and reports throughput,
+p50/p95 per-theme latency, failures and the overhead of the JSON-repair pass
+for malformed Prompt 2 output. No API key or network access is needed.
+
+    python bench/run_bench.py --themes 24 --concurrency 1,4,8,16 --malformed-rate 0.1
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import research  # noqa: E402
+from instrumentation import tracer  # noqa: E402
+from providers import ProviderConfig, ProviderRouter  # noqa: E402
+from bench.mock_server import MockConfig, start_mock_server  # noqa: E402
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def point_clients_at(base_url: str, max_retries: int, hedge: bool) -> None:
+    # Called before every scenario: an AsyncOpenAI connection pool is bound to
+    # the event loop it was first used on, and each batch gets a fresh loop.
+    # This also resets the latency history hedging works from.
+    tiers = {
+        tier: [ProviderConfig(name="mock", model=cfgs[0].model, base_url=base_url, api_key="bench")]
+        for tier, cfgs in research.DEFAULT_PROVIDER_TIERS.items()
+    }
+    research.set_providers(ProviderRouter(tiers, max_retries=max_retries, backoff_base_s=0.05, hedge=hedge))
+
+
+def summarize(name: str, n_themes: int, elapsed: float, failures: int) -> Dict[str, Any]:
+    theme_spans = [s for s in tracer.spans if s.name == "theme" and s.error is None]
+    repair_spans = [s for s in tracer.spans if s.name == "json_repair"]
+    latencies = [s.wall_s for s in theme_spans]
+    total_theme_time = sum(latencies) or 1e-9
+    return {
+        "scenario": name,
+        "themes": n_themes,
+        "elapsed_s": elapsed,
+        "themes_per_min": n_themes / elapsed * 60 if elapsed else 0.0,
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "failures": failures,
+        "repairs": len(repair_spans),
+        "repair_overhead_pct": 100.0 * sum(s.wall_s for s in repair_spans) / total_theme_time,
+        "input_tokens": sum(s.input_tokens for s in theme_spans),
+        "cached_tokens": sum(s.cached_tokens for s in theme_spans),
+        "routing": dict(research.get_providers().stats),
+    }
+
+
+def run_sequential(themes: List[str]) -> Dict[str, Any]:
+    tracer.spans = []
+    failures = 0
+    start = time.perf_counter()
+    for t in themes:
+        try:
+            research.run_research_for_oz(t)
+        except Exception:
+            failures += 1
+    return summarize("sequential", len(themes), time.perf_counter() - start, failures)
+
+
+def run_batch_at(themes: List[str], concurrency: int) -> Dict[str, Any]:
+    tracer.spans = []
+    start = time.perf_counter()
+    results = research.run_sync(research.run_batch(themes, concurrency=concurrency))
+    failures = sum(1 for r in results if r.error is not None)
+    return summarize(f"batch c={concurrency}", len(themes), time.perf_counter() - start, failures)
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    header = f"{'scenario':<14}{'themes':>7}{'elapsed s':>11}{'themes/min':>12}{'p50 s':>8}{'p95 s':>8}{'fail':>6}{'repairs':>9}{'repair %':>10}{'cached %':>10}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        cached_pct = 100.0 * r["cached_tokens"] / r["input_tokens"] if r["input_tokens"] else 0.0
+        lines.append(
+            f"{r['scenario']:<14}{r['themes']:>7}{r['elapsed_s']:>11.2f}{r['themes_per_min']:>12.1f}"
+            f"{r['p50_s']:>8.2f}{r['p95_s']:>8.2f}{r['failures']:>6}{r['repairs']:>9}"
+            f"{r['repair_overhead_pct']:>9.1f}%{cached_pct:>9.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the research pipeline against a mock Responses API.")
+    parser.add_argument("--themes", type=int, default=16, help="Number of synthetic themes per scenario.")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="Comma-separated batch concurrency levels.")
+    parser.add_argument("--skip-sequential", action="store_true", help="Skip the sequential run_research_for_oz baseline.")
+    parser.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=MockConfig.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--malformed-rate", type=float, default=MockConfig.malformed_rate)
+    parser.add_argument("--prompt-2-mode", choices=research.PROMPT_2_MODES, default=research.PROMPT_2_MODE)
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries on 429/5xx, as in production (backoff is shortened).")
+    parser.add_argument("--no-hedge", action="store_true", help="Disable hedged requests.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FILE", help="Also write the results as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own progress output.")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    server = start_mock_server(config)
+
+    # Measure the pipeline, not the on-disk cache or checkpoints.
+    research.response_cache.mode = "off"
+    research.PROMPT_2_MODE = args.prompt_2_mode
+    tracer.path = None
+
+    themes = [f"Benchmark theme {i}: AI-innate workflow automation area #{i}" for i in range(args.themes)]
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+
+    print(
+        f"Mock API at {server.base_url}: latency={config.latency_ms:.0f}ms tok/s={config.tokens_per_second:.0f} "
+        f"errors={config.error_rate:.0%} malformed={config.malformed_rate:.0%} prompt-2-mode={args.prompt_2_mode}\n"
+    )
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    scenarios = ([] if args.skip_sequential else [None]) + levels
+
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # anything the pipeline writes lands in a scratch dir
+        for level in scenarios:
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            point_clients_at(server.base_url, args.max_retries, hedge=not args.no_hedge)
+            with quiet:
+                row = run_sequential(themes) if level is None else run_batch_at(themes, level)
+            rows.append(row)
+            table = format_table([row]).splitlines()
+            print("\n".join(table if len(rows) == 1 else table[-1:]))
+
+    server.shutdown()
+    print(f"\nMock server stats: {server.stats}")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config.__dict__, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import json
+import uuid
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+# ----------------- CONFIG -----------------
+
+RUNS_DIR = os.getenv("RESEARCH_RUNS_DIR", "runs")
+
+# Stage name -> file name inside the run directory, in pipeline order.
+STAGE_FILES = {
+    "memo": "memo.md",  # Prompt 1 output
+    "prompt_2_raw": "prompt_2_raw.txt",  # Prompt 2 output text, before parsing
+    "concepts": "concepts.json",  # parsed (or repaired) concepts
+}
+
+
+def new_run_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+
+
+def theme_run_id(batch_run_id: str, oz_text: str) -> str:
+    """
+    Stable per-theme run ID inside a batch, so rerunning the batch with the
+    same ID resumes every theme.
+    """
+    return f"{batch_run_id}-{hashlib.sha1(oz_text.encode('utf-8')).hexdigest()[:10]}"
+
+
+# ----------------- CHECKPOINTS -----------------
+
+
+class RunCheckpoint:
+    """
+    Durable per-run stage outputs under RUNS_DIR/<run_id>/.
+
+    Each stage is written atomically (temp file + fsync + rename) as soon as
+    it completes, so a crash or a failed later stage never loses earlier work.
+    """
+
+    def __init__(self, run_id: str, runs_dir: str = RUNS_DIR):
+        self.run_id = run_id
+        self.dir = os.path.join(runs_dir, run_id)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _write_atomic(self, name: str, text: str) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        path = self._path(name)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _read(self, name: str) -> Optional[str]:
+        try:
+            with open(self._path(name), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path("run.json"))
+
+    def save_meta(self, meta: Dict[str, Any]) -> None:
+        self._write_atomic("run.json", json.dumps(meta, ensure_ascii=False, indent=2))
+
+    def load_meta(self) -> Optional[Dict[str, Any]]:
+        text = self._read("run.json")
+        return json.loads(text) if text is not None else None
+
+    def save(self, stage: str, text: str) -> None:
+        self._write_atomic(STAGE_FILES[stage], text)
+
+    def load(self, stage: str) -> Optional[str]:
+        return self._read(STAGE_FILES[stage])
+
+    def first_incomplete_stage(self) -> Optional[str]:
+        for stage in STAGE_FILES:
+            if self.load(stage) is None:
+                return stage
+        return None
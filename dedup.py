@@ -0,0 +1,247 @@
+import re
+import zlib
+import argparse
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Set
+
+import numpy as np
+
+# ----------------- CONFIG -----------------
+
+NUM_PERM = 128  # MinHash signature length
+LSH_BANDS = 32  # NUM_PERM must be divisible by LSH_BANDS; 4 rows per band
+SHINGLE_SIZE = 3  # word n-grams
+SIMILARITY_THRESHOLD = 0.5  # estimated Jaccard at or above which two concepts are near-duplicates
+
+# Text fields that define "the same concept". `name` is deliberately left out:
+# near-duplicates are the same problem/solution under a different name.
+DEDUP_FIELDS = ["problem", "solution"]
+
+_PRIME = np.uint64((1 << 31) - 1)  # a*x + b stays below 2**63 for x, a, b < 2**31
+_NO_SHINGLES = np.iinfo(np.uint32).max  # signature value of a text with no shingles; real minima are < _PRIME
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+# ----------------- MINHASH -----------------
+
+
+def concept_text(concept: Any) -> str:
+    d = concept if isinstance(concept, dict) else concept.__dict__
+    return " ".join(str(d.get(f, "") or "") for f in DEDUP_FIELDS)
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> Set[str]:
+    """
+    Word k-grams of `text`. Texts shorter than k words have none: they are
+    too short to compare meaningfully and are left out of dedup.
+    """
+    words = _WORD_RE.findall(text.lower())
+    return {" ".join(words[i : i + k]) for i in range(len(words) - k + 1)}
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    return np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles(text, k)), dtype=np.uint64
+    ) % _PRIME
+
+
+class MinHasher:
+    """
+    MinHash over word shingles with NUM_PERM universal hash functions
+    h(x) = (a*x + b) mod p, evaluated for all functions and all shingles at
+    once with NumPy. The seed is fixed so signatures stored on disk stay
+    comparable across runs.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts: List[str], chunk_size: int = 256) -> np.ndarray:
+        """
+        (len(texts), num_perm) uint32 signature matrix. Shingles of up to
+        `chunk_size` texts are hashed in one pass and reduced per text with
+        np.minimum.reduceat. Texts without shingles get an all-_NO_SHINGLES
+        row (see has_shingles).
+        """
+        out = np.full((len(texts), self.num_perm), _NO_SHINGLES, dtype=np.uint32)
+        for lo in range(0, len(texts), chunk_size):
+            hashes = [shingle_hashes(t) for t in texts[lo : lo + chunk_size]]
+            nonempty = [i for i, h in enumerate(hashes) if len(h)]
+            if not nonempty:
+                continue
+
+            flat = np.concatenate([hashes[i] for i in nonempty])
+            starts = np.cumsum([0] + [len(hashes[i]) for i in nonempty[:-1]])
+            permuted = (self.a[:, None] * flat[None, :] + self.b[:, None]) % _PRIME  # (num_perm, n_shingles)
+            out[[lo + i for i in nonempty]] = np.minimum.reduceat(permuted, starts, axis=1).T.astype(np.uint32)
+        return out
+
+
+def has_shingles(sig: np.ndarray) -> bool:
+    return not bool((sig == _NO_SHINGLES).all())
+
+
+# ----------------- LSH INDEX -----------------
+
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures. Concepts that agree on every row of
+    at least one band become candidates; candidates are then confirmed by
+    their estimated Jaccard similarity. Insert and query are O(bands) each,
+    so clustering a corpus is roughly linear in its size.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = LSH_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self.signatures: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, sig: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, sig[band * self.rows : (band + 1) * self.rows].tobytes()
+
+    def insert(self, key: int, sig: np.ndarray) -> None:
+        self.signatures[key] = sig
+        for bk in self._band_keys(sig):
+            self.buckets.setdefault(bk, []).append(key)
+
+    def query(self, sig: np.ndarray, threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple[int, float]]:
+        """
+        Indexed keys whose estimated Jaccard with `sig` is >= threshold,
+        most similar first.
+        """
+        candidates: Set[int] = set()
+        for bk in self._band_keys(sig):
+            candidates.update(self.buckets.get(bk, ()))
+        if not candidates:
+            return []
+
+        keys = list(candidates)
+        sims = (np.stack([self.signatures[k] for k in keys]) == sig[None, :]).mean(axis=1)
+        matches = [(k, float(s)) for k, s in zip(keys, sims) if s >= threshold]
+        return sorted(matches, key=lambda m: -m[1])
+
+
+# ----------------- CONCEPT DEDUPER -----------------
+
+
+class ConceptDeduper:
+    """
+    Incremental near-duplicate detection over stored concepts.
+
+    Keeps an LSH index of every concept signature seen so far plus each
+    concept's cluster root. New concepts are checked against the existing
+    corpus and against each other; a near-duplicate is marked with the ID of
+    its cluster's canonical (first-seen) concept. Existing signatures are
+    loaded from the results store, so nothing already stored is re-hashed.
+    Concepts whose text has no shingles are never indexed or marked.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, num_perm: int = NUM_PERM, bands: int = LSH_BANDS):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(num_perm, bands)
+        self.root: Dict[int, int] = {}  # concept ID -> canonical concept ID
+
+    @classmethod
+    def from_store(cls, store: Any, **kwargs: Any) -> "ConceptDeduper":
+        deduper = cls(**kwargs)
+        for concept_id, duplicate_of, blob in store.iter_signatures():
+            sig = np.frombuffer(blob, dtype=np.uint32)
+            if not has_shingles(sig):
+                continue
+            deduper.index.insert(concept_id, sig)
+            deduper.root[concept_id] = duplicate_of if duplicate_of is not None else concept_id
+        return deduper
+
+    def _find_root(self, concept_id: int) -> int:
+        root = self.root.get(concept_id, concept_id)
+        while self.root.get(root, root) != root:
+            root = self.root[root]
+        return root
+
+    def assign(self, concepts: List[Tuple[int, Any]]) -> List[Tuple[int, Optional[int], bytes]]:
+        """
+        For (concept_id, concept) pairs about to be stored, returns
+        (concept_id, duplicate_of, signature bytes) and adds them to the index.
+        `duplicate_of` is None for concepts that start a new cluster.
+        """
+        if not concepts:
+            return []
+
+        sigs = self.hasher.signatures([concept_text(c) for _, c in concepts])
+        out: List[Tuple[int, Optional[int], bytes]] = []
+        for (concept_id, _), sig in zip(concepts, sigs):
+            if not has_shingles(sig):
+                out.append((concept_id, None, sig.tobytes()))
+                continue
+            matches = [k for k, _ in self.index.query(sig, self.threshold) if k != concept_id]
+            duplicate_of = self._find_root(matches[0]) if matches else None
+            self.index.insert(concept_id, sig)
+            self.root[concept_id] = duplicate_of if duplicate_of is not None else concept_id
+            out.append((concept_id, duplicate_of, sig.tobytes()))
+        return out
+
+    def forget(self, concept_ids: Iterable[int]) -> None:
+        """
+        Drops concepts from the in-memory index, e.g. after a failed write.
+        """
+        ids = set(concept_ids)
+        for cid in ids:
+            sig = self.index.signatures.pop(cid, None)
+            self.root.pop(cid, None)
+            if sig is None:
+                continue
+            for bk in self.index._band_keys(sig):
+                bucket = self.index.buckets.get(bk)
+                if bucket and cid in bucket:
+                    bucket.remove(cid)
+
+
+# ----------------- CLI -----------------
+
+
+def main():
+    from results_store import ResultsStore, RESULTS_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Near-duplicate detection over stored concepts.")
+    parser.add_argument("--db", default=RESULTS_DB_PATH)
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--show", action="store_true", help="Print every cluster with more than one concept.")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    deduper = ConceptDeduper.from_store(store, threshold=args.threshold)
+
+    # Backfill concepts stored before dedup existed (or with dedup turned off).
+    pending = list(store.concepts_without_signatures())
+    if pending:
+        marks = deduper.assign([(c["id"], c) for c in pending])
+        store.save_signatures(marks)
+    print(f"Indexed {len(deduper.index)} concepts ({len(pending)} newly signed).")
+
+    clusters: Dict[int, List[int]] = {}
+    for cid in deduper.root:
+        clusters.setdefault(deduper._find_root(cid), []).append(cid)
+    dup_clusters = {r: ids for r, ids in clusters.items() if len(ids) > 1}
+    print(f"{len(clusters)} clusters, {len(dup_clusters)} with near-duplicates.")
+
+    if args.show:
+        names = store.concept_names([cid for ids in dup_clusters.values() for cid in ids])
+        for root, ids in sorted(dup_clusters.items(), key=lambda kv: -len(kv[1])):
+            print(f"\nCluster {root} ({len(ids)} concepts):")
+            for cid in sorted(ids):
+                print(f"  {cid:>6}  {names.get(cid, '?')}")
+
+
+if __name__ == "__main__":
+    main()
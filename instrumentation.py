@@ -0,0 +1,208 @@
+import json
+import time
+import threading
+import contextvars
+import collections
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Iterator, Deque
+
+# ----------------- PRICING (ESTIMATES) -----------------
+
+# USD per 1M tokens. Estimates for budgeting only; update as list prices change.
+MODEL_PRICING = {
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+}
+
+# USD per web search tool call.
+WEB_SEARCH_COST_PER_CALL = 0.025
+
+
+def estimate_cost(model: str, usage: Dict[str, int], web_search_calls: int = 0) -> float:
+    """
+    Estimated USD cost of one call. Unknown models are priced at 0 for tokens.
+    """
+    price = MODEL_PRICING.get(model)
+    if price is None:
+        # Dated snapshots, e.g. "gpt-4.1-2025-04-14"
+        price = next((p for m, p in sorted(MODEL_PRICING.items(), key=lambda kv: -len(kv[0])) if model.startswith(m)), None)
+    cost = web_search_calls * WEB_SEARCH_COST_PER_CALL
+    if price is not None:
+        cached = usage.get("cached_tokens", 0)
+        uncached = max(usage.get("input_tokens", 0) - cached, 0)
+        cost += (uncached * price["input"] + cached * price["cached_input"] + usage.get("output_tokens", 0) * price["output"]) / 1e6
+    return cost
+
+
+# ----------------- SPANS -----------------
+
+
+@dataclass
+class Span:
+    name: str
+    theme: Optional[str] = None
+    run_id: Optional[str] = None
+    start_ts: float = 0.0
+    wall_s: float = 0.0
+    ttft_s: Optional[float] = None  # only observable on streaming calls
+    calls: int = 0
+    cache_hits: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    web_search_calls: int = 0
+    cost_usd: float = 0.0
+    error: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def add_totals(self, other: "Span") -> None:
+        self.calls += other.calls
+        self.cache_hits += other.cache_hits
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.web_search_calls += other.web_search_calls
+        self.cost_usd += other.cost_usd
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Collects per-stage and per-theme spans.
+
+    Spans nest: a stage span opened inside a theme span rolls its token, call
+    and cost totals up into the theme span when it ends. Every finished span
+    is kept in memory for the end-of-run summary and, if `path` is set,
+    appended to that file as one JSON line. With `max_spans`, only the most
+    recent spans are kept in memory (the file still gets every span).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_spans: Optional[int] = None):
+        self.path = path
+        self.spans: Deque[Span] = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def set_max_spans(self, max_spans: Optional[int]) -> None:
+        """
+        Bounds (or, with None, unbounds) in-memory retention, keeping the most
+        recent spans already recorded.
+        """
+        with self._lock:
+            self.spans = collections.deque(self.spans, maxlen=max_spans)
+
+    @contextmanager
+    def span(self, name: str, theme: Optional[str] = None, run_id: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            theme=theme if theme is not None else (parent.theme if parent else None),
+            run_id=run_id if run_id is not None else (parent.run_id if parent else None),
+            start_ts=time.time(),
+            attrs=dict(attrs),
+        )
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}".splitlines()[0]
+            raise
+        finally:
+            span.wall_s = time.perf_counter() - start
+            _current_span.reset(token)
+            if parent is not None:
+                # Child spans may finish concurrently on worker threads.
+                with self._lock:
+                    parent.add_totals(span)
+                    if parent.ttft_s is None and span.ttft_s is not None:
+                        parent.ttft_s = (span.start_ts - parent.start_ts) + span.ttft_s
+            self._emit(span)
+
+    def record_call(
+        self,
+        model: str,
+        usage: Dict[str, int],
+        web_search_calls: int = 0,
+        first_token_ts: Optional[float] = None,
+        cache_hit: bool = False,
+    ) -> None:
+        """
+        Adds one model call to the current span (no-op outside a span).
+        `first_token_ts` is the time.time() at which a streaming call produced
+        its first output text.
+        """
+        span = _current_span.get()
+        if span is None:
+            return
+        cost = 0.0 if cache_hit else estimate_cost(model, usage, web_search_calls)
+        # Spans may be shared by calls on several threads.
+        with self._lock:
+            span.calls += 1
+            if cache_hit:
+                span.cache_hits += 1
+                return
+            span.input_tokens += usage.get("input_tokens", 0)
+            span.cached_tokens += usage.get("cached_tokens", 0)
+            span.output_tokens += usage.get("output_tokens", 0)
+            span.web_search_calls += web_search_calls
+            span.cost_usd += cost
+            if span.ttft_s is None and first_token_ts is not None:
+                span.ttft_s = first_token_ts - span.start_ts
+
+    def _emit(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(span), ensure_ascii=False) + "\n")
+
+    def summary_table(self) -> str:
+        """
+        Per-stage totals across the run, plus one row per theme.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return "No spans recorded."
+
+        by_stage: Dict[str, List[Span]] = {}
+        for s in spans:
+            if s.name != "theme":
+                by_stage.setdefault(s.name, []).append(s)
+
+        header = f"{'stage':<18}{'n':>5}{'wall s':>10}{'p95 s':>9}{'ttft s':>9}{'in tok':>10}{'cached':>10}{'out tok':>10}{'search':>8}{'cost $':>9}"
+        lines = [header, "-" * len(header)]
+
+        def row(label: str, group: List[Span]) -> str:
+            walls = sorted(s.wall_s for s in group)
+            p95 = walls[min(len(walls) - 1, int(0.95 * len(walls)))]
+            ttfts = [s.ttft_s for s in group if s.ttft_s is not None]
+            ttft = f"{sum(ttfts) / len(ttfts):.2f}" if ttfts else "-"
+            return (
+                f"{label[:17]:<18}{len(group):>5}{sum(walls):>10.1f}{p95:>9.1f}{ttft:>9}"
+                f"{sum(s.input_tokens for s in group):>10}{sum(s.cached_tokens for s in group):>10}"
+                f"{sum(s.output_tokens for s in group):>10}{sum(s.web_search_calls for s in group):>8}"
+                f"{sum(s.cost_usd for s in group):>9.3f}"
+            )
+
+        for name, group in by_stage.items():
+            lines.append(row(name, group))
+
+        themes = [s for s in spans if s.name == "theme"]
+        if themes:
+            lines.append("-" * len(header))
+            for s in themes:
+                lines.append(row(s.theme or "?", [s]) + ("  FAILED" if s.error else ""))
+            lines.append(row("ALL THEMES", themes))
+
+        return "\n".join(lines)
+
+
+# Process-wide tracer; main() points it at a JSONL file with --trace.
+tracer = Tracer()
@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Deque
+
+# ----------------- CONFIG -----------------
+
+DEFAULT_TIMEOUT_S = 600.0  # per request; Prompt 1 with web search can take minutes
+MAX_RETRIES = 3  # per provider, on 429 / 5xx / timeouts / connection errors
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+
+# Hedging: once a provider has this many successful calls for a prompt, a call
+# still running past its p95 latency gets a backup request; first answer wins.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 0.95
+LATENCY_WINDOW = 200  # latencies kept per (provider, prompt)
+
+
+@dataclass
+class ProviderConfig:
+    """
+    One OpenAI-compatible Responses API endpoint and the model to call on it.
+    `base_url` None means api.openai.com; the key is read from `api_key_env`
+    unless `api_key` is given directly.
+    """
+
+    name: str
+    model: str
+    base_url: Optional[str] = None
+    api_key_env: str = "OPENAI_API_KEY"
+    api_key: Optional[str] = None
+    timeout_s: float = DEFAULT_TIMEOUT_S
+    web_search: bool = True  # False: skipped for requests that carry tools
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "ProviderConfig":
+        return cls(**{k: v for k, v in d.items() if k in cls.__dataclass_fields__})
+
+
+# ----------------- PROVIDER -----------------
+
+
+class Provider:
+    """
+    A configured endpoint with a lazily created async client and a rolling
+    window of observed latencies per prompt. The SDK's own retries are off:
+    the router decides when to retry, back off or fail over.
+    """
+
+    def __init__(self, config: ProviderConfig):
+        self.config = config
+        self._async_client: Any = None  # openai.AsyncOpenAI, imported on first use
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    @property
+    def model(self) -> str:
+        return self.config.model
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {
+            "api_key": self.config.api_key or os.getenv(self.config.api_key_env),
+            "base_url": self.config.base_url,
+            "timeout": self.config.timeout_s,
+            "max_retries": 0,
+        }
+
+    @property
+    def async_client(self) -> Any:
+        # An AsyncOpenAI connection pool is bound to the event loop it was
+        # first used on, so a new loop (another asyncio.run) gets a new client.
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(**self._client_kwargs())
+            self._async_loop = loop
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """
+        Closes the async client if it belongs to the running loop, so its
+        connections are not left to be cleaned up after the loop is gone.
+        """
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async_client.close()
+            self._async_client = None
+            self._async_loop = None
+
+    def observe(self, label: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(label, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_delay(self, label: str) -> Optional[float]:
+        """
+        Observed p95 latency for this prompt, or None until there is enough
+        history to trust it.
+        """
+        with self._lock:
+            window = self._latencies.get(label)
+            if window is None or len(window) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(window)
+        return ordered[min(len(ordered) - 1, int(HEDGE_PERCENTILE * len(ordered)))]
+
+    async def create_async(self, request: Dict[str, Any]) -> Any:
+        return await self.async_client.responses.create(model=self.model, **request)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import openai
+
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# ----------------- ROUTER -----------------
+
+
+class ProviderRouter:
+    """
+    Routes Responses API calls over named tiers ("default", "repair") of
+    providers in fallback order.
+
+    Each provider gets up to `max_retries` retries with exponential backoff
+    and jitter on 429 / 5xx / timeout / connection errors; once those are
+    exhausted, or on any other API error (bad key, unknown model), the next
+    provider in the tier is tried. With `hedge` on, a non-streaming call still
+    running past the provider's observed p95 for that prompt gets a backup
+    request to the next provider (or the same one if it is alone), and the
+    first successful answer is used and the losing request is cancelled.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, List[ProviderConfig]],
+        max_retries: int = MAX_RETRIES,
+        backoff_base_s: float = BACKOFF_BASE_S,
+        backoff_max_s: float = BACKOFF_MAX_S,
+        hedge: bool = True,
+    ):
+        self.tiers: Dict[str, List[Provider]] = {t: [Provider(c) for c in cfgs] for t, cfgs in tiers.items()}
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.hedge = hedge
+        self.stats: Dict[str, int] = {"retries": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0}
+        self._stats_lock = threading.Lock()
+
+    def primary_model(self, tier: str) -> str:
+        return self.tiers[tier][0].model
+
+    def _count(self, stat: str) -> None:
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _candidates(self, tier: str, request: Dict[str, Any]) -> List[Provider]:
+        if tier not in self.tiers:
+            raise RuntimeError(f"No providers configured for tier {tier!r}")
+        providers = [p for p in self.tiers[tier] if p.config.web_search or not request.get("tools")]
+        if not providers:
+            raise RuntimeError(f"No provider in tier {tier!r} supports web search")
+        return providers
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
+        delay *= random.uniform(0.5, 1.0)
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max_s))
+        return delay
+
+    def _on_error(self, provider: Provider, attempt: int, exc: BaseException) -> Optional[float]:
+        """
+        Seconds to sleep before retrying `provider`, or None to fail over.
+        Non-API errors are re-raised.
+        """
+        import openai
+
+        if not isinstance(exc, openai.APIError):
+            raise exc
+        if is_retryable(exc) and attempt < self.max_retries:
+            self._count("retries")
+            return self._backoff(attempt, exc)
+        print(f"  [{provider.name}] giving up after {attempt + 1} attempt(s): {type(exc).__name__}: {exc}".splitlines()[0])
+        return None
+
+    async def aclose(self) -> None:
+        for providers in self.tiers.values():
+            for provider in providers:
+                await provider.aclose()
+
+    async def _timed_async(self, provider: Provider, label: str, request: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        response = await provider.create_async(request)
+        provider.observe(label, time.perf_counter() - start)
+        return response
+
+    async def _hedged_async(
+        self, primary: Provider, backup: Provider, label: str, request: Dict[str, Any]
+    ) -> Tuple[Any, Provider]:
+        delay = primary.hedge_delay(label) if self.hedge else None
+        if delay is None:
+            return await self._timed_async(primary, label, request), primary
+
+        first = asyncio.ensure_future(self._timed_async(primary, label, request))
+        tasks = {first: primary}
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if not done:
+            self._count("hedges")
+            tasks[asyncio.ensure_future(self._timed_async(backup, label, request))] = backup
+
+        pending = set(tasks)
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if len(tasks) > 1 and tasks[task] is backup:
+                        self._count("hedge_wins")
+                    return task.result(), tasks[task]
+        finally:
+            for task in pending:
+                task.cancel()
+        raise errors[0]
+
+    async def create_async(self, tier: str, label: Optional[str] = None, **request: Any) -> Tuple[Any, Provider]:
+        """
+        responses.create with retries, failover and hedging. Returns the
+        response and the provider that produced it. Latencies for hedging are
+        tracked per `label` (default: the prompt_cache_key), so calls that
+        share a cache key but differ in size can be kept apart.
+        """
+        providers = self._candidates(tier, request)
+        label = label or request.get("prompt_cache_key") or tier
+        last_exc: Optional[BaseException] = None
+        for i, provider in enumerate(providers):
+            if i:
+                self._count("failovers")
+            backup = providers[i + 1] if i + 1 < len(providers) else provider
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await self._hedged_async(provider, backup, label, request)
+                except Exception as e:
+                    last_exc = e
+                    sleep_s = self._on_error(provider, attempt, e)
+                    if sleep_s is None:
+                        break
+                    await asyncio.sleep(sleep_s)
+        assert last_exc is not None
+        raise last_exc
+
+    async def stream_async(self, tier: str, **request: Any) -> Tuple[Any, Provider]:
+        """
+        Opens a streaming responses.create with retries and failover while
+        connecting. Not hedged, and errors after the first event are not
+        retried: the caller has already consumed part of the output.
+        """
+        providers = self._candidates(tier, request)
+        last_exc: Optional[BaseException] = None
+        for i, provider in enumerate(providers):
+            if i:
+                self._count("failovers")
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await provider.create_async(dict(request, stream=True)), provider
+                except Exception as e:
+                    last_exc = e
+                    sleep_s = self._on_error(provider, attempt, e)
+                    if sleep_s is None:
+                        break
+                    await asyncio.sleep(sleep_s)
+        assert last_exc is not None
+        raise last_exc
+
+
+def load_provider_tiers(path: str) -> Dict[str, List[ProviderConfig]]:
+    """
+    Reads tiers from a JSON file such as
+        {"default": [{"name": "openai", "model": "gpt-4.1"},
+                     {"name": "azure", "model": "gpt-4.1", "base_url": "https://.../openai/v1",
+                      "api_key_env": "AZURE_OPENAI_API_KEY", "timeout_s": 300}],
+         "repair": [{"name": "openai-mini", "model": "gpt-4.1-mini", "timeout_s": 60}]}
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise RuntimeError(f"{path}: expected an object mapping tier names to provider lists")
+    tiers: Dict[str, List[ProviderConfig]] = {}
+    for tier, entries in data.items():
+        if not isinstance(entries, list) or not entries:
+            raise RuntimeError(f"{path}: tier {tier!r} must be a non-empty list of providers")
+        tiers[tier] = [ProviderConfig.from_dict(e) for e in entries]
+    return tiers
@@ -0,0 +1,320 @@
+import json
+import asyncio
+import hashlib
+import argparse
+import functools
+from typing import List, Dict, Any, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import research
+from instrumentation import tracer
+from results_store import ResultsStore, RESULTS_DB_PATH
+
+# ----------------- CONFIG -----------------
+
+SCORE_BATCH_SIZE = 20  # concepts per first-pass scoring call
+RANK_CONCURRENCY = 8  # scoring / judging calls in flight at once
+FIELD_CHARS = 600  # each concept field is clipped to this many characters in prompts
+
+# Fields shown to the judge. `comparables` is left out: it is mostly names.
+JUDGE_FIELDS = ["problem", "solution", "user", "why_now", "differentiation", "risks"]
+
+# Both prompts start with the (static) AI Investment Framework from Prompt 2,
+# so every scoring and judging call shares one cached prefix.
+SCORE_INSTRUCTIONS = """
+You are prioritizing startup concepts for the company creation funnel. Score each concept below from 1 (weak) to 10
+(exceptional) on its overall fit with the AI Investment Framework above: size of the pain point and the upside, how
+AI-innate it is, defensibility and moat, and resilience. Use the whole scale.
+
+Respond ONLY with valid JSON in this format, with one entry per concept:
+{"scores": [{"id": 123, "score": 7}]}
+
+Concepts:
+"""
+
+JUDGE_INSTRUCTIONS = """
+You are prioritizing startup concepts for the company creation funnel. Judged against the AI Investment Framework
+above (size of the pain point and the upside, how AI-innate it is, defensibility and moat, resilience), which of the
+two concepts below should the investment team pursue first?
+
+Respond ONLY with valid JSON: {"winner": "A"} or {"winner": "B"}
+
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def framework_prefix() -> str:
+    template = research.PROMPT_2_TEMPLATE
+    start = template.index("### AI Investment Framework")
+    end = template.index("Use the following expanded memo", start)
+    return template[start:end].rstrip() + "\n\n"
+
+
+def judge_key(tier: str, instructions: str) -> str:
+    """
+    Memo key for scores / verdicts: changes with the tier's primary model and
+    the prompt, so stale verdicts are never reused.
+    """
+    model = research.get_providers().primary_model(tier)
+    digest = hashlib.sha256((framework_prefix() + instructions).encode("utf-8")).hexdigest()[:12]
+    return f"{model}:{digest}"
+
+
+def render_concept(c: Dict[str, Any], fields: List[str] = JUDGE_FIELDS) -> str:
+    lines = [c["name"]]
+    for f in fields:
+        value = " ".join(str(c.get(f) or "").split())
+        lines.append(f"{f.replace('_', ' ').capitalize()}: {value[:FIELD_CHARS]}{'...' if len(value) > FIELD_CHARS else ''}")
+    return "\n".join(lines)
+
+
+def render_score_prompt(concepts: List[Dict[str, Any]]) -> str:
+    body = "\n\n".join(f"[id {c['id']}] " + render_concept(c, ["problem", "solution", "user"]) for c in concepts)
+    return framework_prefix() + SCORE_INSTRUCTIONS.lstrip("\n") + body + "\n"
+
+
+def render_judge_prompt(a: Dict[str, Any], b: Dict[str, Any]) -> str:
+    return framework_prefix() + JUDGE_INSTRUCTIONS.lstrip("\n") + f"Concept A: {render_concept(a)}\n\nConcept B: {render_concept(b)}\n"
+
+
+# ----------------- RANKER -----------------
+
+
+class ConceptRanker:
+    """
+    Ranks stored concepts in two passes.
+
+    1. First-pass score: concepts are scored 1-10 in batches of
+       SCORE_BATCH_SIZE per call (cheap "score" tier), all batches in flight
+       at once. This seeds the order and picks the tournament field.
+    2. Tournament: a merge sort whose comparisons are pairwise judge calls
+       ("judge" tier), so n concepts need O(n log n) comparisons rather than
+       the O(n^2) of judging every pair. Independent merges run concurrently.
+
+    Scores and verdicts are memoized in the results store. Given the previous
+    ordering, concepts already in it keep their relative order and new ones
+    are placed by binary search (O(log n) comparisons each, all searches
+    concurrent); new concepts landing in the same gap are sorted among
+    themselves. Every pair is judged in both orders so the judge's position
+    bias cancels out: verdicts are memoized per order, and a pair whose two
+    verdicts disagree is a tie, broken by first-pass score.
+    """
+
+    def __init__(self, store: ResultsStore, concurrency: int = RANK_CONCURRENCY):
+        self.store = store
+        self.sem = asyncio.Semaphore(max(1, concurrency))
+        self.score_key = judge_key("score", SCORE_INSTRUCTIONS)
+        self.judge_key = judge_key("judge", JUDGE_INSTRUCTIONS)
+        self.scores: Dict[int, float] = store.load_scores(self.score_key)
+        self.verdicts: Dict[Tuple[int, int], int] = store.load_comparisons(self.judge_key)
+        self.stats: Dict[str, int] = {"score_calls": 0, "comparisons": 0, "memoized": 0, "ties": 0}
+
+    # ---- first pass ----
+
+    async def _score_batch(self, batch: List[Dict[str, Any]]) -> None:
+        async with self.sem:
+            with tracer.span("rank_score", concepts=len(batch)):
+                raw = await research.create_response_text_async(render_score_prompt(batch), [], "rank_score", tier="score")
+        self.stats["score_calls"] += 1
+        ids = {c["id"] for c in batch}
+        try:
+            items = research.load_json_output(raw).get("scores") or []
+            scores = {int(s["id"]): float(s["score"]) for s in items if isinstance(s, dict) and int(s.get("id", -1)) in ids}
+        except (ValueError, TypeError, KeyError, RuntimeError) as e:
+            print(f"  [rank_score] unparseable scores for {len(batch)} concepts, left unscored: {str(e).splitlines()[0]}")
+            return
+        self.scores.update(scores)
+        self.store.save_scores(self.score_key, scores)
+
+    async def score(self, concepts: List[Dict[str, Any]]) -> None:
+        todo = [c for c in concepts if c["id"] not in self.scores]
+        batches = [todo[i : i + SCORE_BATCH_SIZE] for i in range(0, len(todo), SCORE_BATCH_SIZE)]
+        await asyncio.gather(*(self._score_batch(b) for b in batches))
+
+    def by_score(self, concepts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return sorted(concepts, key=lambda c: (-self.scores.get(c["id"], 0.0), c["id"]))
+
+    # ---- tournament ----
+
+    async def _judge(self, first: Dict[str, Any], second: Dict[str, Any]) -> Optional[int]:
+        """
+        Winner ID with `first` shown as "A", or None if the judge gave no
+        usable answer.
+        """
+        pair = (first["id"], second["id"])
+        winner = self.verdicts.get(pair)
+        if winner is not None:
+            self.stats["memoized"] += 1
+            return winner
+
+        async with self.sem:
+            with tracer.span("rank_judge"):
+                raw = await research.create_response_text_async(render_judge_prompt(first, second), [], "rank_judge", tier="judge")
+        self.stats["comparisons"] += 1
+        try:
+            choice = str(research.load_json_output(raw).get("winner", "")).strip().upper()
+        except RuntimeError:
+            choice = ""
+        if choice not in ("A", "B"):
+            # Don't memoize a non-answer.
+            print(f"  [rank_judge] no verdict for {pair}, using first-pass scores")
+            return None
+
+        winner = first["id"] if choice == "A" else second["id"]
+        self.verdicts[pair] = winner
+        self.store.save_comparison(self.judge_key, first["id"], second["id"], winner)
+        return winner
+
+    async def prefer(self, a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        """
+        True if `a` should rank above `b`: the judge picks `a` with either
+        concept shown first. Ties (and missing verdicts) fall back to the
+        first-pass order.
+        """
+        ab, ba = await asyncio.gather(self._judge(a, b), self._judge(b, a))
+        if ab is not None and ab == ba:
+            return ab == a["id"]
+        if ab is not None and ba is not None:
+            self.stats["ties"] += 1
+        return self.by_score([a, b])[0] is a
+
+    async def _merge(self, left: List[Dict[str, Any]], right: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        i = j = 0
+        while i < len(left) and j < len(right):
+            if await self.prefer(left[i], right[j]):
+                out.append(left[i])
+                i += 1
+            else:
+                out.append(right[j])
+                j += 1
+        return out + left[i:] + right[j:]
+
+    async def sort(self, concepts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if len(concepts) <= 1:
+            return list(concepts)
+        mid = len(concepts) // 2
+        left, right = await asyncio.gather(self.sort(concepts[:mid]), self.sort(concepts[mid:]))
+        return await self._merge(left, right)
+
+    async def _insertion_point(self, ordered: List[Dict[str, Any]], concept: Dict[str, Any]) -> int:
+        lo, hi = 0, len(ordered)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if await self.prefer(concept, ordered[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    async def insert(self, ordered: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Places `new` concepts into an already ranked list.
+        """
+        points = await asyncio.gather(*(self._insertion_point(ordered, c) for c in new))
+        gaps: Dict[int, List[Dict[str, Any]]] = {}
+        for c, p in zip(new, points):
+            gaps.setdefault(p, []).append(c)
+        sorted_gaps = dict(zip(gaps, await asyncio.gather(*(self.sort(self.by_score(g)) for g in gaps.values()))))
+
+        out: List[Dict[str, Any]] = []
+        for i in range(len(ordered) + 1):
+            out.extend(sorted_gaps.get(i, []))
+            if i < len(ordered):
+                out.append(ordered[i])
+        return out
+
+    async def rank(
+        self,
+        concepts: List[Dict[str, Any]],
+        previous: Optional[List[int]] = None,
+        top: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Full ranking, best first. Only the `top` concepts by first-pass score
+        (all if None) enter the tournament; the rest follow in score order.
+        """
+        await self.score(concepts)
+        seeded = self.by_score(concepts)
+        field, rest = (seeded[:top], seeded[top:]) if top else (seeded, [])
+
+        in_field = {c["id"]: c for c in field}
+        kept = [in_field[cid] for cid in (previous or []) if cid in in_field]
+        kept_ids = {c["id"] for c in kept}
+        new = [c for c in field if c["id"] not in kept_ids]
+        if kept:
+            print(f"Re-ranking: {len(kept)} concepts keep their order, {len(new)} to place.")
+            ordered = await self.insert(kept, new) if new else kept
+        else:
+            ordered = await self.sort(field)
+        return ordered + rest
+
+
+# ----------------- CLI -----------------
+
+
+def ranking_scope(theme: Optional[str], top: Optional[int]) -> str:
+    return (f"theme:{theme}" if theme else "all") + (f":top{top}" if top else "")
+
+
+async def run_ranking(
+    store: ResultsStore,
+    theme: Optional[str] = None,
+    top: Optional[int] = None,
+    concurrency: int = RANK_CONCURRENCY,
+    fresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Ranks the unique (non-near-duplicate) stored concepts of one theme, or of
+    every theme, and saves the ordering. Unless `fresh`, the previous
+    ordering for the same scope is extended instead of rebuilt.
+    """
+    concepts = list(store.iter_concepts(theme=theme, unique_only=True))
+    if not concepts:
+        return []
+    scope = ranking_scope(theme, top)
+    ranker = ConceptRanker(store, concurrency)
+    previous = None if fresh else store.load_ranking(scope)
+    ranked = await ranker.rank(concepts, previous, top)
+    store.save_ranking(scope, [c["id"] for c in ranked])
+
+    s = ranker.stats
+    print(
+        f"Ranked {len(ranked)} concepts: {s['score_calls']} scoring calls, "
+        f"{s['comparisons']} new comparisons, {s['memoized']} memoized, {s['ties']} ties."
+    )
+    for i, c in enumerate(ranked, start=1):
+        c["rank"] = i
+        c["score"] = ranker.scores.get(c["id"])
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank stored concepts: batched first-pass scores, then a pairwise tournament.")
+    parser.add_argument("--db", default=RESULTS_DB_PATH)
+    parser.add_argument("--theme", help="Only rank this theme's concepts (default: all themes).")
+    parser.add_argument("--top", type=int, help="Only the top N by first-pass score enter the tournament.")
+    parser.add_argument("--concurrency", type=int, default=RANK_CONCURRENCY)
+    parser.add_argument("--fresh", action="store_true", help="Rebuild the ordering instead of extending the stored one.")
+    parser.add_argument("--json", action="store_true", help="Print the ranking as JSON lines.")
+    args = parser.parse_args()
+
+    load_dotenv()  # load .env locally
+    store = ResultsStore(args.db)
+    ranked = research.run_sync(run_ranking(store, args.theme, args.top, args.concurrency, args.fresh))
+    if not ranked:
+        print("No concepts to rank.")
+        return
+
+    for c in ranked:
+        if args.json:
+            print(json.dumps({k: c[k] for k in ("rank", "id", "score", "theme", "name")}, ensure_ascii=False))
+        else:
+            score = f"{c['score']:.0f}" if c["score"] is not None else "-"
+            print(f"{c['rank']:>4}  {score:>5}  {c['id']:>6}  {c['name'][:50]:<50}  {c['theme'][:40]}")
+    research.print_usage_totals()
+
+
+if __name__ == "__main__":
+    main()
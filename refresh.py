@@ -0,0 +1,355 @@
+import re
+import asyncio
+import difflib
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Set, Pattern
+
+from dotenv import load_dotenv
+
+from checkpoints import new_run_id, theme_run_id
+from results_store import ResultsStore, RESULTS_DB_PATH
+from token_budget import MemoSection
+
+if TYPE_CHECKING:  # research imports this module; the calls that need it live there
+    from research import Concept, ResearchResult
+
+# ----------------- CONFIG -----------------
+
+# Memo sections whose heading matches are re-researched with web search; all
+# others (problem framing, AI capabilities, stakeholders) are reused verbatim.
+TIME_SENSITIVE_HEADINGS = r"why now|market|tailwind|regulat|comparabl|competit|landscape|funding"
+
+# Concept fields that draw on each kind of time-sensitive section. A concept
+# depends on a section when one of these fields cites a fact from it; a
+# section matching no pattern here is linked through every field.
+SECTION_DEPENDENCIES = {
+    r"why now|market|timing|tailwind|regulat|reimburs|funding": ["why_now"],
+    r"comparabl|competit|landscape|incumbent": ["comparables", "differentiation"],
+}
+
+# Names too common in these memos to tie a concept to a section.
+COMMON_FACTS = {
+    "AI", "GenAI", "ML", "NLP", "LLM", "LLMs", "API", "APIs", "SaaS", "ROI", "KPI", "KPIs",
+    "B2B", "B2C", "IT", "US", "U.S", "USA", "UK", "EU",
+}
+
+UNCHANGED_MARKER = "UNCHANGED"
+UNCHANGED_RATIO = 0.97  # a re-researched section this similar to the old one, with the same facts, is kept as it was
+MIN_FACT_CHARS = 2
+THESIS_CHARS = 400  # outline thesis rebuilt from a stored concept, for the fan-out expansion prompt
+REFRESH_CONCURRENCY = 4  # themes refreshed at once by the CLI
+
+# Static instructions first and the section last, so every refresh call
+# shares one cached prefix.
+REFRESH_PROMPT_TEMPLATE = """
+You are updating one section of an existing research memo on a healthcare AI opportunity area.
+
+Use web search to check every time-sensitive claim in the section: market sizes and growth figures, funding, payer and
+regulatory changes, "why now" factors, and the companies and products named as comparables or incumbents. Update
+figures that have changed, remove what is no longer true, and add material developments since the section was
+written. Keep everything that is still accurate word for word, and keep the section's structure, markdown and length.
+
+If nothing material has changed, respond with exactly: UNCHANGED
+Otherwise respond ONLY with the updated section text, without its heading.
+
+Today's date: {{TODAY}}
+Theme: {{THEME}}
+Section (last researched {{LAST_DATE}}):
+{{SECTION}}
+"""
+
+# Numbers (with currency / unit) and proper names: the facts a concept may
+# have been built on.
+_FACT_RE = re.compile(
+    r"\$?\d[\d,.]*(?:\s?(?:%|(?:bn|billion|million|trillion|[kKmMbB])\b))?"
+    r"|[A-Z][\w&.-]*\w(?:\s+[A-Z][\w&.-]*\w)*"
+)
+_ARTICLE_RE = re.compile(r"^(?:The|A|An|This|These|That|Those|Its|Their|Our)\s+")
+
+
+# ----------------- DATA STRUCTURES -----------------
+
+
+@dataclass
+class SectionChange:
+    heading: str
+    old: str
+    new: str
+    researched: bool  # False: reused verbatim without a call
+
+    @property
+    def changed(self) -> bool:
+        return self.new != self.old
+
+    def diff(self) -> List[str]:
+        """
+        Changed non-blank lines only, as unified-diff "-" / "+" lines.
+        """
+        lines = difflib.unified_diff(self.old.splitlines(), self.new.splitlines(), lineterm="", n=0)
+        return [l for l in lines if l[:1] in "-+" and l[1:].strip() and not l.startswith(("---", "+++"))]
+
+
+@dataclass
+class RefreshResult:
+    result: "ResearchResult"
+    previous_id: int
+    previous_date: str
+    sections: List[SectionChange]
+    regenerated: Dict[int, List[str]]  # concept position -> the changed sections it depends on
+
+
+# ----------------- SECTIONS -----------------
+
+
+def time_sensitive_re(pattern: Optional[str] = None) -> Pattern[str]:
+    return re.compile(pattern or TIME_SENSITIVE_HEADINGS, re.IGNORECASE)
+
+
+def render_refresh_prompt(oz_text: str, section: MemoSection, last_date: str) -> str:
+    today = datetime.now(timezone.utc).date().isoformat()
+    return (
+        REFRESH_PROMPT_TEMPLATE.replace("{{TODAY}}", today)
+        .replace("{{THEME}}", oz_text)
+        .replace("{{LAST_DATE}}", last_date)
+        .replace("{{SECTION}}", section.text.strip())
+    )
+
+
+def refresh_unchanged(old: str, new: str) -> bool:
+    """
+    True if a re-researched section body `new` makes no material change to
+    `old`: the model said so, or only lightly reworded it, keeping every
+    figure and name.
+    """
+    new, old = new.strip(), old.strip()
+    if not new or new.strip("`*. ").upper() == UNCHANGED_MARKER:
+        return True
+    return extract_facts(new) == extract_facts(old) and difflib.SequenceMatcher(None, old, new, autojunk=False).ratio() >= UNCHANGED_RATIO
+
+
+def with_layout(old_body: str, new: str) -> str:
+    """
+    `new` with the blank lines that surrounded `old_body`, so the memo's layout is unchanged.
+    """
+    lead = old_body[: len(old_body) - len(old_body.lstrip())]
+    tail = old_body[len(old_body.rstrip()) :]
+    return lead + new.strip() + tail
+
+
+# ----------------- AFFECTED CONCEPTS -----------------
+
+
+def _at_sentence_start(text: str, pos: int) -> bool:
+    before = text[:pos].rstrip(" \t*_>#-`(\"")
+    return not before or before[-1] in ".!?:;\n"
+
+
+def extract_facts(text: str) -> Set[str]:
+    """
+    Numbers and proper names in `text`. A leading article is dropped ("The
+    Joint Commission" -> "Joint Commission"), names in COMMON_FACTS are
+    skipped, and so is a single capitalized word at the start of a sentence
+    or bullet unless it looks like an acronym or product name ("CMS",
+    "GLP-1s").
+    """
+    facts = set()
+    for m in _FACT_RE.finditer(text):
+        fact = m.group().rstrip(",.")
+        article = _ARTICLE_RE.match(fact)
+        start = m.start()
+        if article:
+            fact, start = fact[article.end() :], start + article.end()
+        if len(fact) < MIN_FACT_CHARS or fact in COMMON_FACTS:
+            continue
+        if (
+            fact[0].isalpha()
+            and " " not in fact
+            and not any(ch.isupper() or ch.isdigit() for ch in fact[1:])
+            and (article or _at_sentence_start(text, start))
+        ):
+            continue
+        facts.add(fact)
+    return facts
+
+
+def _mentions(text: str, fact: str) -> bool:
+    return re.search(r"(?<!\w)" + re.escape(fact) + r"(?!\w)", text) is not None
+
+
+def dependent_fields(heading: str) -> Optional[List[str]]:
+    """
+    Concept fields that draw on a section with this heading, or None for all.
+    """
+    fields = [f for pattern, fs in SECTION_DEPENDENCIES.items() if re.search(pattern, heading, re.IGNORECASE) for f in fs]
+    return list(dict.fromkeys(fields)) or None
+
+
+def theme_vocabulary(sections: List[SectionChange]) -> Set[str]:
+    """
+    Facts stated in more than half of the memo's sections that state any
+    (the theme's own names and acronyms, e.g. "PA" in a prior-authorization
+    memo): they tie a concept to the theme, not to any one section.
+    """
+    per_section = [extract_facts(s.old) | extract_facts(s.new) for s in sections]
+    per_section = [facts for facts in per_section if facts]
+    if len(per_section) < 2:
+        return set()
+    counts: Dict[str, int] = {}
+    for facts in per_section:
+        for f in facts:
+            counts[f] = counts.get(f, 0) + 1
+    return {f for f, n in counts.items() if n > len(per_section) / 2}
+
+
+def depends_on(concept: "Concept", section: SectionChange, ignore: Set[str] = frozenset()) -> bool:
+    """
+    True if the concept's fields that draw on `section` cite any fact it
+    states, before or after the refresh, other than those in `ignore`.
+    """
+    fields = dependent_fields(section.heading)
+    values = concept.__dict__ if fields is None else {f: getattr(concept, f, "") for f in fields}
+    text = "\n".join(str(v or "") for v in values.values())
+    facts = (extract_facts(section.old) | extract_facts(section.new)) - ignore
+    return any(_mentions(text, f) for f in facts)
+
+
+def affected_concepts(concepts: List["Concept"], sections: List[SectionChange]) -> Dict[int, List[str]]:
+    """
+    Positions of the concepts that depend on a changed section of the memo
+    (all of whose `sections` are given), with the headings of those
+    sections. Any change counts, added facts (a new competitor, newer
+    figures) as well as removed ones.
+    """
+    changed = [s for s in sections if s.changed]
+    vocabulary = theme_vocabulary(sections)
+    affected = {}
+    for i, c in enumerate(concepts):
+        headings = [s.heading.lstrip("# ") or "(preamble)" for s in changed if depends_on(c, s, vocabulary)]
+        if headings:
+            affected[i] = headings
+    return affected
+
+
+def concept_outline(concepts: List["Concept"]) -> List[Dict[str, str]]:
+    """
+    Fan-out outline rebuilt from stored concepts, so a single concept can be
+    re-expanded while the others are named as ones not to overlap with.
+    """
+    outline = []
+    for c in concepts:
+        thesis = " ".join(" - ".join(p for p in (c.user, c.solution) if p).split())
+        outline.append({"name": c.name, "thesis": thesis[:THESIS_CHARS]})
+    return outline
+
+
+# ----------------- REPORT -----------------
+
+
+def format_section_diff(refresh: RefreshResult, max_lines: int = 12) -> str:
+    """
+    Section-level report: reused / unchanged / refreshed per section (with
+    its changed lines), then which concepts were regenerated and why.
+    """
+    lines = [f"Changes since result {refresh.previous_id} ({refresh.previous_date}):"]
+    for c in refresh.sections:
+        heading = c.heading.lstrip("# ") or "(preamble)"
+        if not c.researched:
+            lines.append(f"  = {heading}  [reused]")
+        elif not c.changed:
+            lines.append(f"  = {heading}  [re-researched, unchanged]")
+        else:
+            diff = c.diff()
+            added = sum(1 for l in diff if l.startswith("+"))
+            lines.append(f"  ~ {heading}  [refreshed: +{added} -{len(diff) - added} lines]")
+            lines.extend(f"      {l[:160]}" for l in diff[:max_lines])
+            if len(diff) > max_lines:
+                lines.append(f"      ... {len(diff) - max_lines} more")
+
+    concepts = refresh.result.concepts
+    lines.append(f"Concepts: {len(refresh.regenerated)} of {len(concepts)} regenerated.")
+    for i, headings in refresh.regenerated.items():
+        why = f" (depends on: {', '.join(headings)})" if headings else ""
+        lines.append(f"  ~ {concepts[i].name}{why}")
+    return "\n".join(lines)
+
+
+# ----------------- CLI -----------------
+
+
+async def refresh_themes(
+    store: ResultsStore,
+    themes: List[str],
+    sections_re: Pattern[str],
+    concurrency: int = REFRESH_CONCURRENCY,
+    save: bool = True,
+    deduper: Optional[Any] = None,
+) -> int:
+    """
+    Refreshes each theme's latest stored result and appends the new result.
+    Returns the number of themes that failed.
+    """
+    import research
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    run_id = new_run_id()
+    failed = 0
+
+    async def run_one(oz_text: str) -> Optional[RefreshResult]:
+        async with sem:
+            try:
+                previous = store.latest_result(oz_text)
+                if previous is None:
+                    raise RuntimeError("no stored result to refresh")
+                return await research.refresh_result(previous, sections_re)
+            except Exception as e:
+                print(f"[{research._theme_label(oz_text)}] FAILED: {e}")
+                return None
+
+    for fut in asyncio.as_completed([run_one(t) for t in themes]):
+        refresh = await fut
+        if refresh is None:
+            failed += 1
+            continue
+        print(f"\n[{research._theme_label(refresh.result.oz_text)}] " + format_section_diff(refresh))
+        if save:
+            result_id = research.save_result(store, refresh.result, theme_run_id(run_id, refresh.result.oz_text), deduper)
+            print(f"Saved result {result_id}.")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Incremental re-research: refresh only the time-sensitive memo sections of stored themes."
+    )
+    parser.add_argument("--db", default=RESULTS_DB_PATH)
+    parser.add_argument("--theme", action="append", default=[], help="Theme to refresh (repeatable).")
+    parser.add_argument("--all", action="store_true", help="Refresh every theme in the store.")
+    parser.add_argument(
+        "--sections",
+        metavar="REGEX",
+        help=f"Headings of the sections to re-research (default: {TIME_SENSITIVE_HEADINGS!r}).",
+    )
+    parser.add_argument("--concurrency", type=int, default=REFRESH_CONCURRENCY, help="Themes refreshed at once.")
+    parser.add_argument("--dry-run", action="store_true", help="Report the diff without saving a new result.")
+    parser.add_argument("--no-dedup", action="store_true", help="Don't mark near-duplicate concepts when saving.")
+    args = parser.parse_args()
+
+    import research
+
+    load_dotenv()  # load .env locally
+    store = ResultsStore(args.db)
+    themes = list(dict.fromkeys(r["theme"] for r in store.iter_results())) if args.all else args.theme
+    if not themes:
+        parser.error("give --theme or --all")
+
+    deduper = None if args.no_dedup or args.dry_run else research._load_deduper(store)
+    failed = research.run_sync(refresh_themes(store, themes, time_sensitive_re(args.sections), args.concurrency, not args.dry_run, deduper))
+    research.print_usage_totals()
+    if failed:
+        print(f"{failed} of {len(themes)} themes failed.")
+
+
+if __name__ == "__main__":
+    main()
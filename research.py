@@ -1,17 +1,114 @@
 import os
+import re
+import sys
+import csv
 import json
+import asyncio
+import argparse
+import time
+import functools
+import threading
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Awaitable, Pattern, TypeVar
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
-# ----------------- CONFIG -----------------
+from response_cache import ResponseCache, CACHE_MODES
+from checkpoints import RunCheckpoint, new_run_id, theme_run_id
+from instrumentation import tracer
+from results_store import ResultsStore, RESULTS_DB_PATH
+from providers import ProviderConfig, ProviderRouter, load_provider_tiers
+from refresh import (
+    RefreshResult,
+    SectionChange,
+    affected_concepts,
+    concept_outline,
+    format_section_diff,
+    refresh_unchanged,
+    render_refresh_prompt,
+    time_sensitive_re,
+    with_layout,
+)
+from token_budget import (
+    MIN_MEMO_TOKENS,
+    MemoSection,
+    count_tokens,
+    join_memo_sections,
+    prompt_budget,
+    split_memo_sections,
+    summarize_targets,
+    trim_sections,
+    truncate_to_tokens,
+)
+
+if TYPE_CHECKING:  # dedup pulls in NumPy; imported where a deduper is built
+    from dedup import ConceptDeduper
 
-load_dotenv()  # load .env locally
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# ----------------- CONFIG -----------------
 
 MODEL = "gpt-4.1"  # or "gpt-4o" if you prefer
+REPAIR_MODEL = "gpt-4.1-mini"  # cheap model for re-formatting malformed Prompt 2 JSON
+
+# Model calls go through provider tiers: "default" for Prompts 1 and 2,
+# "repair" for the JSON-repair pass, "compress" for shrinking over-budget
+# memos, and "score" / "judge" for concept ranking (ranking.py). Each tier
+# lists OpenAI-compatible endpoints in fallback order; override with
+# --providers or RESEARCH_PROVIDERS (a JSON file, see
+# providers.load_provider_tiers).
+DEFAULT_PROVIDER_TIERS = {
+    "default": [ProviderConfig(name="openai", model=MODEL)],
+    "repair": [ProviderConfig(name="openai", model=REPAIR_MODEL, timeout_s=120.0)],
+    "compress": [ProviderConfig(name="openai", model=REPAIR_MODEL, timeout_s=120.0)],
+    "score": [ProviderConfig(name="openai", model=REPAIR_MODEL, timeout_s=120.0)],
+    "judge": [ProviderConfig(name="openai", model=MODEL, timeout_s=120.0)],
+}
+T = TypeVar("T")
+
+_providers: Optional[ProviderRouter] = None
+_providers_lock = threading.Lock()
+
+WEB_SEARCH_TOOLS = [{"type": "web_search_preview"}]
+
+# On-disk cache in front of every model call. Switch per run with --cache.
+response_cache = ResponseCache()
+
+# Prompt 2 mode:
+#   "single" - one call generates all concepts (original behaviour)
+#   "fanout" - a short outline call, then one concurrent expansion call per concept
+PROMPT_2_MODES = ("single", "fanout")
+PROMPT_2_MODE = "single"
+FANOUT_MAX_WORKERS = 8  # concurrent expansion calls per theme (the outline asks for 5-7)
+
+# Token budget for the rendered Prompt 2. None uses the smallest per-model
+# budget in token_budget.py across the "default" tier; 0 turns the check off.
+PROMPT_2_BUDGET: Optional[int] = None
+
+# Batch mode: max number of themes in flight at once. Each theme runs its own
+# Prompt 1 -> Prompt 2 pipeline, so different themes overlap their stages.
+BATCH_CONCURRENCY = 8
+
+
+def provider_tiers(path: Optional[str] = None) -> Dict[str, List[ProviderConfig]]:
+    return dict(DEFAULT_PROVIDER_TIERS, **(load_provider_tiers(path) if path else {}))
+
+
+def get_providers() -> ProviderRouter:
+    """
+    The process-wide provider router. Built on first use, so importing this
+    module reads no .env file and creates no API clients.
+    """
+    global _providers
+    with _providers_lock:
+        if _providers is None:
+            load_dotenv()  # load .env locally
+            _providers = ProviderRouter(provider_tiers(os.getenv("RESEARCH_PROVIDERS")))
+        return _providers
+
+
+def set_providers(router: ProviderRouter) -> None:
+    global _providers
+    with _providers_lock:
+        _providers = router
 
 
 # ------- PROMPTS (PASTE YOURS, WITH PLACEHOLDERS) -------
@@ -223,6 +320,44 @@ Respond ONLY with valid JSON in this exact format:
 }
 """
 
+# JSON repair: used when Prompt 2's output doesn't parse, instead of re-running
+# the whole web-search generation.
+REPAIR_PROMPT_TEMPLATE = """
+The text below was supposed to be valid JSON in this exact format, but it failed to parse:
+{
+  "concepts": [
+    {
+      "name": "",
+      "problem": "",
+      "solution": "",
+      "user": "",
+      "why_now": "",
+      "comparables": "",
+      "differentiation": "",
+      "risks": ""
+    }
+  ]
+}
+
+Re-format it as valid JSON in that format. Keep every concept and all of its content; do not add, drop or rewrite
+concepts. Respond ONLY with the JSON.
+
+Text to re-format:
+{{RAW_OUTPUT}}
+"""
+
+# Used when the expanded memo pushes Prompt 2 over its token budget.
+COMPRESS_PROMPT_TEMPLATE = """
+Condense the following section of a research memo to at most {{TARGET_TOKENS}} tokens.
+
+Keep every concrete fact: numbers, dates, and the names of companies, products, regulations and evidence sources.
+Drop repetition, hedging and generic commentary. Keep the markdown structure (bullets, bold labels). Output ONLY the
+condensed section text, without its heading.
+
+Section:
+{{SECTION}}
+"""
+
 
 # ----------------- DATA STRUCTURES -----------------
 
@@ -259,39 +394,310 @@ class ResearchResult:
     concepts: List[Concept]
 
 
-# ----------------- CORE CALLS (WITH WEB SEARCH) -----------------
+# ----------------- PROMPT ASSEMBLY -----------------
+#
+# Providers cache the longest previously-seen *prefix* of a prompt. The
+# templates above interleave instructions with the variable parts, so every
+# theme/memo produces a different prompt from the first few hundred bytes on.
+# Here each template is split once per process into a byte-stable prefix
+# (instructions, framework, output format) and a small variable suffix, and
+# prompts are always sent as prefix + suffix.
+
+THEME_REFERENCE = "(the theme stated at the end of this prompt)."
+
+
+@dataclass(frozen=True)
+class PromptLayout:
+    name: str  # also sent as prompt_cache_key to keep same-prefix calls together
+    prefix: str
+    suffix_template: str
+    placeholder: str
+
+    def render(self, value: str) -> str:
+        return self.prefix + self.suffix_template.replace(self.placeholder, value)
+
+
+def _split_template(name: str, template: str, placeholder: str, suffix_template: str, block_pattern: str, inline: str) -> PromptLayout:
+    # Remove the block that carries the variable input, then point any other
+    # inline use of the placeholder at the suffix.
+    body, n = re.subn(block_pattern, "\n\n", template)
+    if n == 0:
+        raise RuntimeError(f"{name}: could not find the {placeholder} input block in the template")
+    prefix = re.sub(r"-?" + re.escape(placeholder), inline, body).rstrip() + "\n\n"
+    return PromptLayout(name=name, prefix=prefix, suffix_template=suffix_template, placeholder=placeholder)
+
+
+@functools.lru_cache(maxsize=None)
+def prompt_1_layout() -> PromptLayout:
+    return _split_template(
+        "prompt_1",
+        PROMPT_1_TEMPLATE,
+        "{{THEME}}",
+        "You have already identified 1 high level idea which is {{THEME}}.\n",
+        r"\n*You have already identified 1 high level idea which is \{\{THEME\}\}\.\s*$",
+        THEME_REFERENCE,
+    )
 
 
-def run_prompt_1(oz_text: str) -> str:
+@functools.lru_cache(maxsize=None)
+def prompt_2_layout() -> PromptLayout:
+    return _split_template(
+        "prompt_2",
+        PROMPT_2_TEMPLATE,
+        "{{EXPANDED_MEMO}}",
+        "Use the following expanded memo as input:\n{{EXPANDED_MEMO}}\n\n"
+        "Respond ONLY with valid JSON in the format specified above.\n",
+        r"\n*Use the following expanded memo as input:\s*\{\{EXPANDED_MEMO\}\}\n*",
+        "the expanded memo at the end of this prompt",
+    )
+
+
+def render_prompt_1(oz_text: str) -> str:
+    return prompt_1_layout().render(oz_text)
+
+
+def render_prompt_2(expanded_memo: str) -> str:
+    return prompt_2_layout().render(expanded_memo)
+
+
+# Fan-out mode reuses Prompt 2's prefix (and puts the memo right after it), so
+# the outline call and every expansion call for a theme share a cached prefix.
+PROMPT_2_OUTLINE_SUFFIX = """Use the following expanded memo as input:
+{{EXPANDED_MEMO}}
+
+For this step, do NOT write out the full concepts. Generate the 5-7 concept ideas as a short outline only.
+Respond ONLY with valid JSON in this format instead of the one above:
+{
+  "concepts": [
+    {
+      "name": "",
+      "thesis": "one-line thesis: who the customer is, the problem, and the AI-innate solution"
+    }
+  ]
+}
+"""
+
+PROMPT_2_EXPAND_SUFFIX = """Use the following expanded memo as input:
+{{EXPANDED_MEMO}}
+
+The following concept has already been outlined from this memo:
+Name: {{CONCEPT_NAME}}
+Thesis: {{CONCEPT_THESIS}}
+
+Other concepts being developed separately (do not overlap with them): {{OTHER_CONCEPTS}}
+
+Research and fully develop ONLY this one concept. Respond ONLY with valid JSON in the format specified above,
+with exactly one entry in "concepts".
+"""
+
+
+def render_prompt_2_outline(expanded_memo: str) -> str:
+    return prompt_2_layout().prefix + PROMPT_2_OUTLINE_SUFFIX.replace("{{EXPANDED_MEMO}}", expanded_memo)
+
+
+def render_prompt_2_expand(expanded_memo: str, outline: List[Dict[str, str]], i: int) -> str:
+    others = "; ".join(o["name"] for j, o in enumerate(outline) if j != i) or "none"
+    suffix = (
+        PROMPT_2_EXPAND_SUFFIX.replace("{{CONCEPT_NAME}}", outline[i]["name"])
+        .replace("{{CONCEPT_THESIS}}", outline[i]["thesis"])
+        .replace("{{OTHER_CONCEPTS}}", others)
+        .replace("{{EXPANDED_MEMO}}", expanded_memo)
+    )
+    return prompt_2_layout().prefix + suffix
+
+
+# ----------------- TOKEN USAGE -----------------
+
+# Usage summed over every non-cached call in this process, so a batch can
+# check how much of its input was served from the provider's prompt cache.
+usage_totals: Dict[str, int] = {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+_usage_lock = threading.Lock()
+
+
+def usage_to_dict(usage: Any) -> Dict[str, int]:
+    if usage is None:
+        return {"input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+    }
+
+
+def count_web_search_calls(response: Any) -> int:
+    return sum(1 for item in (getattr(response, "output", None) or []) if getattr(item, "type", "") == "web_search_call")
+
+
+def record_usage(
+    label: str,
+    model: str,
+    usage: Dict[str, int],
+    web_search_calls: int = 0,
+    first_token_ts: Optional[float] = None,
+    provider: Optional[str] = None,
+) -> None:
+    tracer.record_call(model, usage, web_search_calls=web_search_calls, first_token_ts=first_token_ts)
+    with _usage_lock:
+        usage_totals["calls"] += 1
+        for k in ("input_tokens", "cached_tokens", "output_tokens"):
+            usage_totals[k] += usage.get(k, 0)
+    via = f" via {provider}/{model}" if provider else ""
+    print(
+        f"  [{label}] usage{via}: input={usage['input_tokens']} "
+        f"(cached={usage['cached_tokens']}) output={usage['output_tokens']} web_searches={web_search_calls}"
+    )
+
+
+def print_usage_totals() -> None:
+    t = usage_totals
+    if not t["calls"]:
+        return
+    ratio = t["cached_tokens"] / t["input_tokens"] if t["input_tokens"] else 0.0
+    print(
+        f"Token usage over {t['calls']} calls: input={t['input_tokens']} "
+        f"cached={t['cached_tokens']} ({ratio:.0%}) output={t['output_tokens']}"
+    )
+    stats = get_providers().stats
+    if any(stats.values()):
+        print("Provider routing: " + " ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+# ----------------- CORE CALLS (WITH WEB SEARCH) -----------------
+#
+# Every model call is async, on the providers' AsyncOpenAI clients; the sync
+# entry points (run_prompt_1, run_prompt_2, run_research_for_oz) run the
+# same code under asyncio.run.
+
+
+async def create_response_text_async(
+    prompt: str,
+    tools: List[Dict[str, Any]],
+    prompt_cache_key: str,
+    tier: str = "default",
+    label: Optional[str] = None,
+    cache_write: bool = True,
+) -> str:
     """
-    Runs Prompt 1 with web search to produce the expanded 1–2 page memo.
+    Calls the Responses API through the provider tier and returns the merged
+    output text, going through the response cache so identical (model,
+    prompt, tools) calls are reused. Cache entries are keyed by the tier's
+    primary model, whichever provider ends up answering.
+
+    `label` names the call for logging and hedging latencies; it defaults
+    to `prompt_cache_key`. With `cache_write` False the output is not
+    stored: the caller validates it first and then calls cache_response_text.
     """
-    prompt = PROMPT_1_TEMPLATE.replace("{{THEME}}", oz_text)
-
-    response = client.responses.create(
-        model=MODEL,
+    router = get_providers()
+    model = router.primary_model(tier)
+    key = ResponseCache.make_key(model, prompt, tools)
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is not None:
+        tracer.record_call(model, {}, cache_hit=True)
+        return cached["output_text"]
+
+    label = label or prompt_cache_key
+    response, provider = await router.create_async(
+        tier,
+        label=label,
         input=prompt,
-        tools=[{"type": "web_search_preview"}],
+        tools=tools,
+        prompt_cache_key=prompt_cache_key,
     )
 
+    if getattr(response, "status", None) == "incomplete":
+        # Truncated output (e.g. max_output_tokens) must not be cached.
+        details = getattr(response, "incomplete_details", None)
+        raise RuntimeError(f"[{label}] response incomplete: {getattr(details, 'reason', None) or 'unknown reason'}")
+
     # openai-python v1 exposes a merged text helper:
-    expanded_memo = response.output_text
-    return expanded_memo
+    output_text = response.output_text
+    usage = usage_to_dict(response.usage)
+    record_usage(label, provider.model, usage, count_web_search_calls(response), provider=provider.name)
+    if cache_write:
+        await asyncio.to_thread(response_cache.put, key, model, {"output_text": output_text, "usage": usage})
+    return output_text
 
 
-def run_prompt_2(expanded_memo: str) -> List[Concept]:
+async def cache_response_text(prompt: str, tools: List[Dict[str, Any]], output_text: str, tier: str = "default") -> None:
     """
-    Runs Prompt 2 with web search to produce JSON concepts.
+    Stores an output fetched with cache_write=False once it has been validated,
+    so malformed output is never replayed from the cache.
     """
-    prompt = PROMPT_2_TEMPLATE.replace("{{EXPANDED_MEMO}}", expanded_memo)
-
-    response = client.responses.create(
-        model=MODEL,
+    model = get_providers().primary_model(tier)
+    key = ResponseCache.make_key(model, prompt, tools)
+    await asyncio.to_thread(response_cache.put, key, model, {"output_text": output_text})
+
+
+async def stream_response_text_async(
+    prompt: str,
+    tools: List[Dict[str, Any]],
+    prompt_cache_key: str,
+    on_delta: Callable[[str], None],
+    cache_write: bool = True,
+) -> str:
+    """
+    Streaming variant of create_response_text_async on the "default" tier:
+    calls `on_delta` with each piece of output text as it arrives and
+    returns the full text. A cache hit is delivered as a single delta.
+    """
+    router = get_providers()
+    model = router.primary_model("default")
+    key = ResponseCache.make_key(model, prompt, tools)
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is not None:
+        tracer.record_call(model, {}, cache_hit=True)
+        on_delta(cached["output_text"])
+        return cached["output_text"]
+
+    stream, provider = await router.stream_async(
+        "default",
         input=prompt,
-        tools=[{"type": "web_search_preview"}],
+        tools=tools,
+        prompt_cache_key=prompt_cache_key,
     )
 
-    raw = response.output_text.strip()
+    parts: List[str] = []
+    usage = usage_to_dict(None)
+    web_search_calls = 0
+    first_token_ts: Optional[float] = None
+    async for event in stream:
+        if event.type == "response.output_text.delta":
+            if first_token_ts is None:
+                first_token_ts = time.time()
+            parts.append(event.delta)
+            on_delta(event.delta)
+        elif event.type == "response.completed":
+            usage = usage_to_dict(event.response.usage)
+            web_search_calls = count_web_search_calls(event.response)
+        elif event.type in ("error", "response.failed", "response.incomplete"):
+            # Truncated output (e.g. max_output_tokens) must not be cached.
+            raise RuntimeError(f"Streaming response failed: {event}")
+
+    output_text = "".join(parts)
+    record_usage(prompt_cache_key, provider.model, usage, web_search_calls, first_token_ts, provider=provider.name)
+    if cache_write:
+        await asyncio.to_thread(response_cache.put, key, model, {"output_text": output_text, "usage": usage})
+    return output_text
+
+
+async def run_prompt_1_async(oz_text: str, on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Runs Prompt 1 with web search to produce the expanded 1–2 page memo.
+    With `on_delta`, the memo is streamed to it as it is written.
+    """
+    prompt = render_prompt_1(oz_text)
+    with tracer.span("prompt_1"):
+        if on_delta is not None:
+            return await stream_response_text_async(prompt, WEB_SEARCH_TOOLS, "prompt_1", on_delta)
+        return await create_response_text_async(prompt, WEB_SEARCH_TOOLS, "prompt_1")
+
+
+def load_json_output(raw: str) -> Dict[str, Any]:
+    """
+    Parses a model's JSON-only output, tolerating a ```json fence.
+    """
+    raw = raw.strip()
 
     # Strip ```json ... ``` if the model wraps the JSON
     cleaned = raw
@@ -308,6 +714,16 @@ def run_prompt_2(expanded_memo: str) -> List[Concept]:
         # For debugging if JSON parsing fails
         raise RuntimeError(f"Failed to parse JSON from Prompt 2: {e}\nRaw output (truncated):\n{raw[:1000]}")
 
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Prompt 2 JSON was not an object. Got: {type(data).__name__}")
+    return data
+
+
+def parse_concepts(raw: str) -> List[Concept]:
+    """
+    Parses Prompt 2's raw output text into Concepts.
+    """
+    data = load_json_output(raw)
     concepts_raw = data.get("concepts", [])
     if not isinstance(concepts_raw, list):
         raise RuntimeError(f"Prompt 2 JSON did not contain a 'concepts' list. Got keys: {list(data.keys())}")
@@ -315,17 +731,471 @@ def run_prompt_2(expanded_memo: str) -> List[Concept]:
     return [Concept.from_dict(c) for c in concepts_raw]
 
 
-def run_research_for_oz(oz_text: str) -> ResearchResult:
+def concepts_to_json(concepts: List[Concept]) -> str:
+    return json.dumps({"concepts": [c.__dict__ for c in concepts]}, ensure_ascii=False, indent=2)
+
+
+def render_repair_prompt(raw: str) -> str:
+    return REPAIR_PROMPT_TEMPLATE.replace("{{RAW_OUTPUT}}", raw)
+
+
+async def parse_concepts_with_repair_async(raw: str) -> List[Concept]:
+    """
+    Parses Prompt 2's output; if that fails, runs one cheap re-format pass
+    ("repair" provider tier, no web search) over the raw text instead of regenerating.
+    """
+    try:
+        return parse_concepts(raw)
+    except RuntimeError as e:
+        print(f"Prompt 2 output did not parse ({str(e).splitlines()[0]}). Running JSON repair pass...")
+    with tracer.span("json_repair"):
+        repaired = await create_response_text_async(render_repair_prompt(raw), [], "json_repair", tier="repair")
+    return parse_concepts(repaired)
+
+
+async def generate_prompt_2_async(
+    expanded_memo: str,
+    on_raw: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> List[Concept]:
+    """
+    Runs Prompt 2 with web search and parses its output (with JSON repair).
+    `on_raw` gets the unparsed output text before it is parsed; in fan-out
+    mode this is the reassembled concepts JSON. The output is cached only
+    once it has parsed.
+    """
+    expanded_memo = await fit_memo_to_budget_async(expanded_memo)
+    if PROMPT_2_MODE == "fanout":
+        concepts = await run_prompt_2_fanout_async(expanded_memo)
+        if on_raw:
+            await on_raw(concepts_to_json(concepts))
+        return concepts
+
+    prompt = render_prompt_2(expanded_memo)
+    with tracer.span("prompt_2"):
+        raw = await create_response_text_async(prompt, WEB_SEARCH_TOOLS, "prompt_2", cache_write=False)
+    if on_raw:
+        await on_raw(raw)
+    concepts = await parse_concepts_with_repair_async(raw)
+    await cache_response_text(prompt, WEB_SEARCH_TOOLS, raw)
+    return concepts
+
+
+async def run_prompt_2_async(expanded_memo: str) -> List[Concept]:
+    """
+    Runs Prompt 2 with web search to produce JSON concepts.
+    """
+    return await generate_prompt_2_async(expanded_memo)
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    asyncio.run for the sync entry points. The providers' async clients are
+    bound to the loop, so they are closed before it goes away.
+    """
+
+    async def main() -> T:
+        try:
+            return await coro
+        finally:
+            await get_providers().aclose()
+
+    return asyncio.run(main())
+
+
+def run_prompt_1(oz_text: str) -> str:
+    return run_sync(run_prompt_1_async(oz_text))
+
+
+def run_prompt_2(expanded_memo: str) -> List[Concept]:
+    return run_sync(run_prompt_2_async(expanded_memo))
+
+
+# ----------------- MEMO TOKEN BUDGET -----------------
+
+
+def prompt_2_budget() -> Optional[int]:
+    if PROMPT_2_BUDGET is not None:
+        return PROMPT_2_BUDGET
+    return prompt_budget(p.model for p in get_providers().tiers["default"])
+
+
+def render_compress_prompt(section: MemoSection, target_tokens: int) -> str:
+    return COMPRESS_PROMPT_TEMPLATE.replace("{{TARGET_TOKENS}}", str(target_tokens)).replace("{{SECTION}}", section.text)
+
+
+def _prompt_2_tokens(expanded_memo: str, model: str) -> int:
+    return count_tokens(render_prompt_2(expanded_memo), model)
+
+
+def _memo_summarize_targets(sections: List[MemoSection], memo_budget: int, model: str) -> Dict[int, int]:
+    over_by = count_tokens(join_memo_sections(sections), model) - memo_budget
+    return summarize_targets([count_tokens(s.body, model) for s in sections], over_by)
+
+
+def _finish_memo_budget(sections: List[MemoSection], budget: int, memo_budget: int, model: str, before: int, span: Any) -> str:
+    """
+    Joins the compressed sections, truncates to `memo_budget` as a last
+    resort if the model ignored its targets, and logs what was saved.
+    """
+    memo = join_memo_sections(sections)
+    if count_tokens(memo, model) > memo_budget:
+        memo = truncate_to_tokens(memo, memo_budget, model)
+        span.attrs["truncated"] = True
+    after = _prompt_2_tokens(memo, model)
+    span.attrs.update(tokens_after=after, tokens_saved=before - after)
+    theme = f" {_theme_label(span.theme)}:" if span.theme else ""
+    print(f"  [memo_budget]{theme} Prompt 2 input {before} -> {after} tokens (budget {budget}, saved {before - after}).")
+    return memo
+
+
+async def _summarize_section_async(section: MemoSection, target_tokens: int) -> str:
+    with tracer.span("memo_compress", section=section.heading):
+        prompt = render_compress_prompt(section, target_tokens)
+        return (await create_response_text_async(prompt, [], "memo_compress", tier="compress")).strip()
+
+
+async def fit_memo_to_budget_async(expanded_memo: str) -> str:
+    """
+    The memo to splice into Prompt 2. Returned unchanged when the rendered
+    prompt fits prompt_2_budget(); otherwise every section is first trimmed
+    of citations, URLs and source lists, and if that is not enough the
+    larger sections are condensed concurrently by the "compress" tier
+    (a cheap model, no web search). The full memo is still what gets stored.
+
+    The memo gets whatever the budget leaves after the template. A budget
+    leaving it less than MIN_MEMO_TOKENS is not applied (with a warning):
+    Prompt 2 would otherwise run on a memo cut to almost nothing.
+    """
+    budget = prompt_2_budget()
+    model = get_providers().primary_model("default")
+    before = _prompt_2_tokens(expanded_memo, model)
+    if not budget or before <= budget:
+        return expanded_memo
+
+    memo_budget = budget - _prompt_2_tokens("", model)
+    if memo_budget < MIN_MEMO_TOKENS:
+        print(
+            f"WARNING: Prompt 2 budget of {budget} tokens leaves {max(memo_budget, 0)} for the memo "
+            f"(minimum {MIN_MEMO_TOKENS}); sending the memo uncompressed."
+        )
+        return expanded_memo
+
+    with tracer.span("memo_budget", tokens_before=before, budget=budget) as span:
+        sections = trim_sections(split_memo_sections(expanded_memo))
+        targets = _memo_summarize_targets(sections, memo_budget, model)
+        if targets:
+            bodies = await asyncio.gather(*(_summarize_section_async(sections[i], n) for i, n in targets.items()))
+            for i, body in zip(targets, bodies):
+                sections[i] = MemoSection(sections[i].heading, body)
+            span.attrs["sections_summarized"] = len(targets)
+        return _finish_memo_budget(sections, budget, memo_budget, model, before, span)
+
+
+# ----------------- FAN-OUT CONCEPT GENERATION -----------------
+
+
+def parse_outline(raw: str) -> List[Dict[str, str]]:
+    """
+    Parses the outline call's {"concepts": [{"name", "thesis"}]} output.
+    """
+    data = load_json_output(raw)
+    items = data.get("concepts")
+    if not isinstance(items, list) or not items:
+        raise RuntimeError(f"Prompt 2 outline did not contain a non-empty 'concepts' list. Got keys: {list(data.keys())}")
+    return [{"name": str(o.get("name", "")), "thesis": str(o.get("thesis", ""))} for o in items if isinstance(o, dict)]
+
+
+def _expanded_concept(concepts: List[Concept], outline_item: Dict[str, str]) -> Concept:
+    if not concepts:
+        raise RuntimeError(f"Expansion of concept {outline_item['name']!r} returned no concepts")
+    concept = concepts[0]
+    concept.name = concept.name or outline_item["name"]
+    return concept
+
+
+async def run_prompt_2_outline_async(expanded_memo: str) -> List[Dict[str, str]]:
+    with tracer.span("prompt_2_outline"):
+        prompt = render_prompt_2_outline(expanded_memo)
+        raw = await create_response_text_async(prompt, WEB_SEARCH_TOOLS, "prompt_2", label="prompt_2_outline", cache_write=False)
+    outline = parse_outline(raw)
+    await cache_response_text(prompt, WEB_SEARCH_TOOLS, raw)
+    return outline
+
+
+async def expand_concept_async(expanded_memo: str, outline: List[Dict[str, str]], i: int) -> Concept:
+    """
+    Fills in every field of outlined concept `i` with its own web-search call.
+    """
+    with tracer.span("prompt_2_expand", concept=outline[i]["name"]):
+        prompt = render_prompt_2_expand(expanded_memo, outline, i)
+        raw = await create_response_text_async(prompt, WEB_SEARCH_TOOLS, "prompt_2", label="prompt_2_expand", cache_write=False)
+    concept = _expanded_concept(await parse_concepts_with_repair_async(raw), outline[i])
+    await cache_response_text(prompt, WEB_SEARCH_TOOLS, raw)
+    return concept
+
+
+async def run_prompt_2_fanout_async(
+    expanded_memo: str,
+    on_concept: Optional[Callable[[Concept], None]] = None,
+) -> List[Concept]:
+    """
+    Fan-out variant of Prompt 2: one short outline call, then every concept is
+    expanded concurrently (at most FANOUT_MAX_WORKERS at a time), so
+    wall-clock time is bounded by the slowest single expansion rather than
+    the sum. `on_concept` is called as each expansion completes; the
+    returned list is in outline order. A failed expansion is logged and
+    dropped; the call fails only if every expansion does.
+    """
+    outline = await run_prompt_2_outline_async(expanded_memo)
+    print(f"Prompt 2 outline: {len(outline)} concepts. Expanding in parallel...")
+    sem = asyncio.Semaphore(FANOUT_MAX_WORKERS)
+
+    async def expand(i: int) -> Concept:
+        async with sem:
+            concept = await expand_concept_async(expanded_memo, outline, i)
+        if on_concept:
+            on_concept(concept)
+        return concept
+
+    results = await asyncio.gather(*(expand(i) for i in range(len(outline))), return_exceptions=True)
+    concepts = [r for r in results if isinstance(r, Concept)]
+    errors = [(o, r) for o, r in zip(outline, results) if isinstance(r, BaseException)]
+    for item, e in errors:
+        print(f"Expansion of concept {item['name']!r} failed: {type(e).__name__}: {e}".splitlines()[0])
+    if not concepts:
+        raise errors[0][1]
+    return concepts
+
+
+# ----------------- STREAMING -----------------
+
+
+class ConceptStreamParser:
+    """
+    Incremental parser for Prompt 2's {"concepts": [ {...}, ... ]} output.
+
+    Feed it text chunks as they arrive; it returns each Concept as soon as
+    that object's closing brace has been seen. Braces inside JSON strings are
+    ignored, and anything before the first "{" (e.g. a ```json fence) is
+    skipped. Objects that fail to parse are counted in `failed`.
     """
-    Run Prompt 1 and Prompt 2 for a single OZ theme string.
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0  # next index in _buf to scan
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._obj_start: Optional[int] = None
+        self.raw_parts: List[str] = []
+        self.failed = 0
+
+    @property
+    def raw(self) -> str:
+        return "".join(self.raw_parts)
+
+    def feed(self, chunk: str) -> List[Concept]:
+        self.raw_parts.append(chunk)
+        self._buf += chunk
+        out: List[Concept] = []
+
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                # A concept is an object directly inside the top-level array.
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._obj_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._stack == ["{", "["] and self._obj_start is not None:
+                    try:
+                        out.append(Concept.from_dict(json.loads(buf[self._obj_start : i + 1])))
+                    except ValueError:
+                        self.failed += 1  # left to the full parse at the end
+                    self._obj_start = None
+            i += 1
+
+        # Drop text we no longer need to keep the buffer small.
+        keep_from = self._obj_start if self._obj_start is not None else i
+        self._buf = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._obj_start is not None:
+            self._obj_start = 0
+        return out
+
+
+async def stream_prompt_2_async(
+    expanded_memo: str,
+    on_concept: Callable[[Concept], None],
+    on_raw: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> List[Concept]:
+    """
+    Streaming variant of run_prompt_2_async: calls `on_concept` with each
+    Concept as soon as it has been generated, instead of waiting for the
+    whole JSON document. `on_raw` is called with the complete output text
+    once the stream ends.
+
+    In fan-out mode, concepts are delivered as each expansion call completes.
+    """
+    expanded_memo = await fit_memo_to_budget_async(expanded_memo)
+    if PROMPT_2_MODE == "fanout":
+        concepts = await run_prompt_2_fanout_async(expanded_memo, on_concept)
+        if on_raw:
+            await on_raw(concepts_to_json(concepts))
+        return concepts
+
+    parser = ConceptStreamParser()
+    concepts = []
+
+    def on_delta(delta: str) -> None:
+        for concept in parser.feed(delta):
+            concepts.append(concept)
+            on_concept(concept)
+
+    prompt = render_prompt_2(expanded_memo)
+    with tracer.span("prompt_2"):
+        await stream_response_text_async(prompt, WEB_SEARCH_TOOLS, "prompt_2", on_delta, cache_write=False)
+    if on_raw:
+        await on_raw(parser.raw)
+
+    # If any object was malformed or the output didn't have the expected
+    # shape, fall back to the strict parser (with JSON repair), as
+    # run_prompt_2 does, and deliver the concepts the stream missed.
+    if parser.failed or not _stream_parse_complete(parser.raw, concepts):
+        parsed = await parse_concepts_with_repair_async(parser.raw)
+        for concept in parsed:
+            if concept not in concepts:
+                on_concept(concept)
+        concepts = parsed
+    await cache_response_text(prompt, WEB_SEARCH_TOOLS, parser.raw)
+    return concepts
+
+
+def _stream_parse_complete(raw: str, concepts: List[Concept]) -> bool:
+    try:
+        return len(parse_concepts(raw)) == len(concepts) > 0
+    except RuntimeError:
+        return False
+
+
+# ----------------- PIPELINE -----------------
+
+
+def open_checkpoint(oz_text: str, run_id: Optional[str]) -> Optional[RunCheckpoint]:
     """
-    print(f"Running Prompt 1 (expand theme) for OZ:\n{oz_text}\n")
-    expanded_memo = run_prompt_1(oz_text)
-    print("Prompt 1 done.\n")
+    Opens (or starts) the checkpoint directory for `run_id`. Returns None when
+    no run ID is given, i.e. checkpointing is off.
+    """
+    if run_id is None:
+        return None
+
+    ckpt = RunCheckpoint(run_id)
+    meta = ckpt.load_meta()
+    if meta is None:
+        ckpt.save_meta({"run_id": run_id, "oz_text": oz_text, "model": MODEL})
+    elif meta.get("oz_text") != oz_text:
+        raise RuntimeError(f"Run {run_id} was started for a different theme: {meta.get('oz_text')!r}")
+    else:
+        stage = ckpt.first_incomplete_stage()
+        print(f"Resuming run {run_id} from stage: {stage or 'complete'}")
+    return ckpt
+
+
+async def run_research_for_oz_async(
+    oz_text: str,
+    run_id: Optional[str] = None,
+    on_memo_delta: Optional[Callable[[str], None]] = None,
+    on_concept: Optional[Callable[[int, Concept], None]] = None,
+) -> ResearchResult:
+    """
+    Run Prompt 1 and Prompt 2 for a single OZ theme string. Every entry point
+    (sync, streaming, batch, worker) runs this one implementation.
 
-    print("Running Prompt 2 (concept generation)...\n")
-    concepts = run_prompt_2(expanded_memo)
-    print(f"Prompt 2 done. Generated {len(concepts)} concepts.\n")
+    With a `run_id`, each stage is checkpointed as soon as it completes and a
+    rerun with the same ID resumes from the first incomplete stage.
+
+    With `on_memo_delta` / `on_concept`, the memo is streamed to the former
+    as it is written and each Concept is passed to the latter (numbered from
+    1) as soon as it is complete; checkpointed stages are replayed through
+    the same callbacks. Without them, one status line is printed per stage,
+    since several themes are usually in flight at once.
+    """
+    with tracer.span("theme", theme=_theme_label(oz_text), run_id=run_id):
+        return await _run_research_for_oz_async(oz_text, run_id, on_memo_delta, on_concept)
+
+
+async def _run_research_for_oz_async(
+    oz_text: str,
+    run_id: Optional[str],
+    on_memo_delta: Optional[Callable[[str], None]],
+    on_concept: Optional[Callable[[int, Concept], None]],
+) -> ResearchResult:
+    label = _theme_label(oz_text)
+    streaming = on_memo_delta is not None or on_concept is not None
+    status = (lambda msg: None) if streaming else (lambda msg: print(f"[{label}] {msg}"))
+    # Checkpoint files are read and written (with fsync) off the event loop,
+    # which other themes in flight share.
+    ckpt = await asyncio.to_thread(open_checkpoint, oz_text, run_id)
+
+    async def load(stage: str) -> Optional[str]:
+        return await asyncio.to_thread(ckpt.load, stage) if ckpt else None
+
+    async def save(stage: str, text: str) -> None:
+        if ckpt:
+            await asyncio.to_thread(ckpt.save, stage, text)
+
+    expanded_memo = await load("memo")
+    if expanded_memo is None:
+        status("Prompt 1 started.")
+        expanded_memo = await run_prompt_1_async(oz_text, on_delta=on_memo_delta)
+        await save("memo", expanded_memo)
+        status("Prompt 1 done.")
+    else:
+        status("Prompt 1: using checkpointed memo.")
+        if on_memo_delta:
+            on_memo_delta(expanded_memo)
+
+    concepts: List[Concept] = []
+
+    def emit(concept: Concept) -> None:
+        concepts.append(concept)
+        if on_concept:
+            on_concept(len(concepts), concept)
+
+    concepts_json = await load("concepts")
+    raw = await load("prompt_2_raw")
+    if concepts_json is not None:
+        status("Prompt 2: using checkpointed concepts.")
+        parsed = parse_concepts(concepts_json)
+    elif raw is not None:
+        status("Prompt 2: re-parsing checkpointed raw output.")
+        parsed = await parse_concepts_with_repair_async(raw)
+    elif on_concept is not None:
+        parsed = await stream_prompt_2_async(expanded_memo, emit, functools.partial(save, "prompt_2_raw"))
+    else:
+        status("Prompt 2 started.")
+        parsed = await generate_prompt_2_async(expanded_memo, functools.partial(save, "prompt_2_raw"))
+
+    if not concepts:  # not streamed: deliver them now
+        for concept in parsed:
+            emit(concept)
+    concepts = parsed
+    if concepts_json is None:
+        await save("concepts", concepts_to_json(concepts))
+    status(f"Prompt 2 done. Generated {len(concepts)} concepts.")
 
     return ResearchResult(
         oz_text=oz_text,
@@ -334,43 +1204,449 @@ def run_research_for_oz(oz_text: str) -> ResearchResult:
     )
 
 
-# ----------------- CLI ENTRYPOINT (for Step 1) -----------------
+def run_research_for_oz(oz_text: str, run_id: Optional[str] = None) -> ResearchResult:
+    """
+    Synchronous run_research_for_oz_async, for scripts and the CLI.
+    """
+    return run_sync(run_research_for_oz_async(oz_text, run_id=run_id))
 
 
-def main():
-    # For Step 1, we just hardcode a sample OZ or accept from input.
-    oz_text = input("Enter OZ / Taxonomy theme: ").strip()
-    if not oz_text:
-        print("No OZ text provided, exiting.")
-        return
+def run_research_for_oz_streaming(
+    oz_text: str,
+    on_memo_delta: Optional[Callable[[str], None]] = None,
+    on_concept: Optional[Callable[[int, Concept], None]] = None,
+    run_id: Optional[str] = None,
+) -> ResearchResult:
+    """
+    Synchronous streaming run: see run_research_for_oz_async for the callbacks.
+    """
+    return run_sync(run_research_for_oz_async(oz_text, run_id=run_id, on_memo_delta=on_memo_delta, on_concept=on_concept))
+
+
+# ----------------- INCREMENTAL RE-RESEARCH (see refresh.py) -----------------
+
+
+async def refresh_section_async(oz_text: str, section: MemoSection, last_date: str) -> str:
+    """
+    Re-researches one memo section with web search and returns its new body,
+    or the old body unchanged when the model reports (or makes) no material
+    change. The date is part of the prompt, so each month's run misses the
+    response cache.
+    """
+    with tracer.span("memo_refresh", section=section.heading):
+        prompt = render_refresh_prompt(oz_text, section, last_date)
+        raw = await create_response_text_async(prompt, WEB_SEARCH_TOOLS, "memo_refresh")
+    return section.body if refresh_unchanged(section.body, raw) else with_layout(section.body, raw)
+
+
+async def refresh_result(previous: Dict[str, Any], sections_re: Optional[Pattern[str]] = None) -> RefreshResult:
+    """
+    Incremental re-run of a stored result (a ResultsStore.latest_result row).
+
+    Only the memo's time-sensitive sections are re-researched with web
+    search, concurrently; every other section is reused verbatim. Concepts
+    that depend on a section that changed are regenerated with the fan-out
+    expansion step against the new memo; the rest are reused.
+    """
+    sections_re = sections_re or time_sensitive_re()
+    oz_text = previous["theme"]
+    previous_date = (previous.get("created_at") or "")[:10] or "unknown"
+    old_sections = split_memo_sections(previous["expanded_memo"])
+    targets = [i for i, s in enumerate(old_sections) if s.heading and sections_re.search(s.heading)]
+    label = _theme_label(oz_text)
+
+    with tracer.span("theme", theme=label, incremental=True) as span:
+        print(f"[{label}] Re-researching {len(targets)} of {len(old_sections)} memo sections (last run {previous_date})...")
+        bodies = await asyncio.gather(*(refresh_section_async(oz_text, old_sections[i], previous_date) for i in targets))
+        new_bodies = dict(zip(targets, bodies))
+        changes = [
+            SectionChange(s.heading, s.body, new_bodies.get(i, s.body), researched=i in new_bodies)
+            for i, s in enumerate(old_sections)
+        ]
+        memo = join_memo_sections([MemoSection(c.heading, c.new) for c in changes])
+
+        concepts = [Concept.from_dict(c) for c in previous["concepts"]]
+        if not concepts:
+            # Nothing to reuse: generate concepts as a normal run would.
+            concepts = await run_prompt_2_async(memo)
+            regenerated: Dict[int, List[str]] = {i: [] for i in range(len(concepts))}
+        else:
+            regenerated = affected_concepts(concepts, changes)
+            if regenerated:
+                print(f"[{label}] Regenerating {len(regenerated)} of {len(concepts)} concepts...")
+                fitted = await fit_memo_to_budget_async(memo)
+                outline = concept_outline(concepts)
+                fresh = await asyncio.gather(
+                    *(expand_concept_async(fitted, outline, i) for i in regenerated), return_exceptions=True
+                )
+                # A failed expansion keeps the previous concept rather than
+                # discarding the sections already re-researched.
+                for i, c in zip(list(regenerated), fresh):
+                    if isinstance(c, BaseException):
+                        print(f"[{label}] Regenerating {concepts[i].name!r} failed, keeping it: {type(c).__name__}: {c}".splitlines()[0])
+                        del regenerated[i]
+                    else:
+                        concepts[i] = c
+        span.attrs.update(
+            sections_researched=len(targets),
+            sections_changed=sum(1 for c in changes if c.changed),
+            concepts_regenerated=len(regenerated),
+        )
+
+    return RefreshResult(
+        result=ResearchResult(oz_text=oz_text, expanded_memo=memo, concepts=concepts),
+        previous_id=previous["id"],
+        previous_date=previous_date,
+        sections=changes,
+        regenerated=regenerated,
+    )
+
+
+async def refresh_from_previous(previous: Dict[str, Any]) -> ResearchResult:
+    """
+    Incremental re-run of a stored result; prints its section-level diff.
+    """
+    refreshed = await refresh_result(previous)
+    print(f"[{_theme_label(previous['theme'])}] " + format_section_diff(refreshed))
+    return refreshed.result
+
+
+# ----------------- BATCH MODE -----------------
+
+
+@dataclass
+class BatchItemResult:
+    oz_text: str
+    result: Optional[ResearchResult] = None
+    error: Optional[str] = None
 
-    result = run_research_for_oz(oz_text)
 
-    # Print a concise summary to console
-    print("\n========== EXPANDED MEMO ==========\n")
-    print(result.expanded_memo)
+def _theme_label(oz_text: str, width: int = 40) -> str:
+    label = " ".join(oz_text.split())
+    return label if len(label) <= width else label[: width - 3] + "..."
 
-    print("\n========== CONCEPTS (SUMMARY) ==========\n")
-    for i, c in enumerate(result.concepts, start=1):
-        print(f"Concept {i}: {c.name}")
-        print(f"  Problem      : {c.problem[:200]}{'...' if len(c.problem) > 200 else ''}")
-        print(f"  Solution     : {c.solution[:200]}{'...' if len(c.solution) > 200 else ''}")
-        print(f"  Why now      : {c.why_now[:200]}{'...' if len(c.why_now) > 200 else ''}")
-        print()
 
-    # Also dump full structured result to JSON file (we'll use this in later steps)
-    out = {
+def save_result(
+    store: ResultsStore,
+    result: ResearchResult,
+    run_id: Optional[str],
+    deduper: Optional["ConceptDeduper"] = None,
+) -> int:
+    """
+    Appends a result to the store. With a `deduper`, concepts are checked
+    against everything already stored and near-duplicates are marked.
+
+    A result already saved under `run_id` (a resumed or rerun run) is not
+    saved again; its ID is returned instead.
+    """
+    if run_id is not None:
+        saved = next(store.iter_results(run_id=run_id), None)
+        if saved is not None:
+            return saved["id"]
+    result_id = store.save_result(result.oz_text, result.expanded_memo, result.concepts, run_id=run_id, model=MODEL, deduper=deduper)
+    if deduper is not None:
+        dups = sum(1 for c in store.concepts_for_result(result_id) if c["duplicate_of"] is not None)
+        if dups:
+            print(f"[{_theme_label(result.oz_text)}] {dups}/{len(result.concepts)} concepts marked as near-duplicates.")
+    return result_id
+
+
+def result_to_dict(result: ResearchResult) -> Dict[str, Any]:
+    return {
         "oz_text": result.oz_text,
         "expanded_memo": result.expanded_memo,
         "concepts": [c.__dict__ for c in result.concepts],
     }
 
-    with open("last_run_output.json", "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
 
-    print("Saved full structured output to last_run_output.json")
+def load_themes(path: str) -> List[str]:
+    """
+    Loads OZ themes from a .jsonl or .csv file.
+
+    JSONL lines may be a bare JSON string or an object with a "theme" (or
+    "oz_text") key. CSV files use the "theme" / "oz_text" column if present,
+    otherwise the first column.
+    """
+    themes: List[str] = []
+
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return themes
+        header = [h.strip().lower() for h in rows[0]]
+        if "theme" in header or "oz_text" in header:
+            col = header.index("theme") if "theme" in header else header.index("oz_text")
+            rows = rows[1:]
+        else:
+            col = 0
+        themes = [row[col].strip() for row in rows if len(row) > col]
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                if isinstance(item, dict):
+                    item = item.get("theme") or item.get("oz_text") or ""
+                if not isinstance(item, str):
+                    raise RuntimeError(f"{path}:{line_no}: expected a string or an object with a 'theme' key")
+                themes.append(item.strip())
+
+    return [t for t in themes if t]
+
+
+async def run_batch(
+    themes: List[str],
+    concurrency: int = BATCH_CONCURRENCY,
+    out_path: Optional[str] = None,
+    run_id: Optional[str] = None,
+    store: Optional[ResultsStore] = None,
+    deduper: Optional["ConceptDeduper"] = None,
+    incremental: bool = False,
+) -> List[BatchItemResult]:
+    """
+    Runs the full pipeline for every theme, with at most `concurrency` themes
+    in flight. A failing theme is recorded and does not stop the others.
+
+    Each successful result is saved to `store` (if given, and deduplicated
+    with `deduper` if given) as soon as it finishes, and each theme's
+    outcome is appended to `out_path` (if given) as one JSON line. With a
+    `run_id`, every theme is checkpointed under a derived per-theme run ID,
+    so rerunning the batch resumes it.
+
+    With `incremental`, themes that already have a result in `store` are
+    refreshed from it (see refresh.py) instead of researched from scratch.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(oz_text: str) -> BatchItemResult:
+        async with sem:
+            try:
+                previous = await asyncio.to_thread(store.latest_result, oz_text) if incremental and store else None
+                if previous is not None:
+                    return BatchItemResult(oz_text=oz_text, result=await refresh_from_previous(previous))
+                theme_id = theme_run_id(run_id, oz_text) if run_id else None
+                return BatchItemResult(oz_text=oz_text, result=await run_research_for_oz_async(oz_text, run_id=theme_id))
+            except Exception as e:
+                print(f"[{_theme_label(oz_text)}] FAILED: {e}")
+                return BatchItemResult(oz_text=oz_text, error=f"{type(e).__name__}: {e}")
+
+    out = open(out_path, "a", encoding="utf-8") if out_path else None
+    results: List[BatchItemResult] = []
+    try:
+        for fut in asyncio.as_completed([run_one(t) for t in themes]):
+            item = await fut
+            results.append(item)
+            if store and item.result is not None:
+                try:
+                    theme_id = theme_run_id(run_id, item.oz_text) if run_id else None
+                    await asyncio.to_thread(save_result, store, item.result, theme_id, deduper)
+                except Exception as e:
+                    print(f"[{_theme_label(item.oz_text)}] FAILED to save result: {e}")
+            if out:
+                if item.result is not None:
+                    record = {"status": "ok", **result_to_dict(item.result)}
+                else:
+                    record = {"status": "error", "oz_text": item.oz_text, "error": item.error}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            print(f"Batch progress: {len(results)}/{len(themes)} themes finished.")
+    finally:
+        if out:
+            out.close()
+
+    return results
+
+
+# ----------------- CLI ENTRYPOINT (for Step 1) -----------------
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OZ theme -> expanded memo -> concepts research pipeline.")
+    parser.add_argument("--batch", metavar="FILE", help="Run every theme in a .jsonl or .csv file.")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Max themes in flight in batch mode.")
+    parser.add_argument("--out", help="Batch mode: also append each theme's outcome (including failures) to this JSONL file.")
+    parser.add_argument("--results-db", default=RESULTS_DB_PATH, help="SQLite results store every result is appended to.")
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Don't mark near-duplicate concepts (MinHash/LSH against the stored corpus) when saving.",
+    )
+    parser.add_argument(
+        "--run-id",
+        help="Checkpoint stages under this run ID; rerunning with the same ID resumes it. A new ID is generated if omitted.",
+    )
+    parser.add_argument(
+        "--prompt-2-mode",
+        choices=PROMPT_2_MODES,
+        default=PROMPT_2_MODE,
+        help="'fanout' outlines concepts first, then expands each one in a concurrent call.",
+    )
+    parser.add_argument(
+        "--prompt-2-budget",
+        type=int,
+        metavar="TOKENS",
+        help="Compress the memo when the rendered Prompt 2 exceeds this many tokens (default: per known model, none otherwise; 0 disables).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Refresh only the time-sensitive memo sections (and the concepts built on them) of themes already in the results store.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Single-theme mode: print the memo and each concept as soon as they are generated.",
+    )
+    parser.add_argument(
+        "--providers",
+        metavar="FILE",
+        default=os.getenv("RESEARCH_PROVIDERS"),
+        help="JSON file of provider tiers (OpenAI-compatible endpoints in fallback order).",
+    )
+    parser.add_argument(
+        "--no-hedge",
+        action="store_true",
+        help="Don't send a backup request when a call runs past its provider's observed p95 latency.",
+    )
+    parser.add_argument("--trace", metavar="FILE", help="Append per-stage / per-theme spans to this JSONL file.")
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="Print a per-stage and per-theme latency / token / cost table at the end of the run.",
+    )
+    parser.add_argument(
+        "--cache",
+        choices=CACHE_MODES,
+        default="use",
+        help="Response cache: 'use' hits, 'refresh' re-run and overwrite, or turn it 'off' for this run.",
+    )
+    return parser.parse_args(argv)
+
+
+def _load_deduper(store: ResultsStore) -> "ConceptDeduper":
+    from dedup import ConceptDeduper
+
+    return ConceptDeduper.from_store(store)
+
+
+def main_batch(args: argparse.Namespace) -> None:
+    themes = load_themes(args.batch)
+    if not themes:
+        print(f"No themes found in {args.batch}, exiting.")
+        return
+
+    run_id = args.run_id or new_run_id()
+    print(f"Running {len(themes)} themes with concurrency {args.concurrency} (run ID {run_id})...\n")
+    store = ResultsStore(args.results_db)
+    deduper = None if args.no_dedup else _load_deduper(store)
+    results = run_sync(
+        run_batch(
+            themes,
+            concurrency=args.concurrency,
+            out_path=args.out,
+            run_id=run_id,
+            store=store,
+            deduper=deduper,
+            incremental=args.incremental,
+        )
+    )
+
+    failed = [r for r in results if r.error is not None]
+    print(f"\nBatch done: {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+    for r in failed:
+        print(f"  FAILED [{_theme_label(r.oz_text)}]: {r.error.splitlines()[0]}")
+    print_usage_totals()
+    if args.summary:
+        print("\n" + tracer.summary_table())
+    print(f"Results saved to {args.results_db} (run ID {run_id})")
+    if args.out:
+        print(f"Outcomes appended to {args.out}")
+
+
+def print_concept_summary(i: int, c: Concept) -> None:
+    print(f"Concept {i}: {c.name}")
+    print(f"  Problem      : {c.problem[:200]}{'...' if len(c.problem) > 200 else ''}")
+    print(f"  Solution     : {c.solution[:200]}{'...' if len(c.solution) > 200 else ''}")
+    print(f"  Why now      : {c.why_now[:200]}{'...' if len(c.why_now) > 200 else ''}")
+    print()
+
+
+def run_streaming(oz_text: str, run_id: Optional[str] = None) -> ResearchResult:
+    """
+    Runs one theme in streaming mode, printing the memo as it is written and
+    each concept as soon as it is complete.
+    """
+    print("\n========== EXPANDED MEMO (STREAMING) ==========\n")
+
+    def on_memo_delta(delta: str) -> None:
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+
+    def on_concept(i: int, c: Concept) -> None:
+        if i == 1:
+            print("\n\n========== CONCEPTS (STREAMING) ==========\n")
+        print_concept_summary(i, c)
+        sys.stdout.flush()
+
+    return run_research_for_oz_streaming(oz_text, on_memo_delta=on_memo_delta, on_concept=on_concept, run_id=run_id)
+
+
+def main():
+    load_dotenv()  # load .env locally, before --providers picks up RESEARCH_PROVIDERS
+    args = parse_args()
+    global PROMPT_2_MODE, PROMPT_2_BUDGET
+    PROMPT_2_MODE = args.prompt_2_mode
+    PROMPT_2_BUDGET = args.prompt_2_budget
+    set_providers(ProviderRouter(provider_tiers(args.providers), hedge=not args.no_hedge))
+    response_cache.mode = args.cache
+    tracer.path = args.trace
+
+    if args.batch:
+        main_batch(args)
+        return
+
+    # Resuming a run reuses its theme; otherwise accept one from input.
+    run_id = args.run_id or new_run_id()
+    meta = RunCheckpoint(run_id).load_meta()
+    if meta is not None:
+        oz_text = meta["oz_text"]
+    else:
+        oz_text = input("Enter OZ / Taxonomy theme: ").strip()
+    if not oz_text:
+        print("No OZ text provided, exiting.")
+        return
+
+    print(f"Run ID: {run_id}\n")
+    store = ResultsStore(args.results_db)
+    previous = store.latest_result(oz_text) if args.incremental else None
+    if previous is not None:
+        result = run_sync(refresh_from_previous(previous))
+    elif args.stream:
+        result = run_streaming(oz_text, run_id)
+    else:
+        result = run_research_for_oz(oz_text, run_id=run_id)
+
+        # Print a concise summary to console
+        print("\n========== EXPANDED MEMO ==========\n")
+        print(result.expanded_memo)
+
+        print("\n========== CONCEPTS (SUMMARY) ==========\n")
+        for i, c in enumerate(result.concepts, start=1):
+            print_concept_summary(i, c)
+
+    # Append the full structured result to the results store; query or export
+    # it later with `python results_store.py`.
+    deduper = None if args.no_dedup else _load_deduper(store)
+    result_id = save_result(store, result, run_id, deduper)
+
+    print_usage_totals()
+    if args.summary:
+        print("\n" + tracer.summary_table())
+    print(f"Saved result {result_id} to {args.results_db}")
 
 
 if __name__ == "__main__":
     main()
-
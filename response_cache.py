@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional
+
+# ----------------- CONFIG -----------------
+
+CACHE_PATH = os.getenv("RESEARCH_CACHE_PATH", ".research_cache/responses.sqlite3")
+CACHE_TTL_SECONDS = int(os.getenv("RESEARCH_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("RESEARCH_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Per-run behaviour:
+#   "use"     - read hits, write misses (default)
+#   "refresh" - ignore existing entries, overwrite them with fresh responses
+#   "off"     - bypass the cache entirely
+CACHE_MODES = ("use", "refresh", "off")
+
+
+# ----------------- CACHE -----------------
+
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache for model responses.
+
+    Entries are keyed on a hash of (model, rendered prompt, tools), expire after
+    `ttl_seconds`, and the least recently used entries are evicted once the
+    stored payloads exceed `max_bytes`. The SQLite file is opened lazily, so
+    creating a cache has no side effects.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        mode: str = "use",
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @staticmethod
+    def make_key(model: str, prompt: str, tools: List[Dict[str, Any]]) -> str:
+        h = hashlib.sha256()
+        for part in (model, prompt, json.dumps(tools, sort_keys=True)):
+            data = part.encode("utf-8")
+            h.update(len(data).to_bytes(8, "big"))
+            h.update(data)
+        return h.hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key        TEXT PRIMARY KEY,
+                    model      TEXT NOT NULL,
+                    payload    TEXT NOT NULL,
+                    size       INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used  REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _ensure_dir(self) -> None:
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached payload for `key`, or None on a miss, an expired
+        entry, or when the mode is not "use".
+        """
+        if self.mode != "use":
+            return None
+
+        with self._lock:
+            self._ensure_dir()
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT payload, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                payload, created_at = row
+                now = time.time()
+                if now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                return json.loads(payload)
+            finally:
+                conn.close()
+
+    def put(self, key: str, model: str, payload: Dict[str, Any]) -> None:
+        if self.mode == "off":
+            return
+
+        data = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._ensure_dir()
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, payload, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, data, len(data.encode("utf-8")), now, now),
+                )
+                self._evict(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until we are back under budget.
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ensure_dir()
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+            finally:
+                conn.close()
@@ -0,0 +1,478 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple, IO
+
+# ----------------- CONFIG -----------------
+
+RESULTS_DB_PATH = os.getenv("RESEARCH_RESULTS_DB", "research_results.sqlite3")
+
+CONCEPT_FIELDS = ["name", "problem", "solution", "user", "why_now", "comparables", "differentiation", "risks"]
+
+
+def _fts5_terms(query: str) -> str:
+    """
+    Quotes each term of `query` as an FTS5 string, so punctuation such as
+    "AI-driven" or "payer's" is matched rather than parsed as query syntax.
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split()) or '""'
+
+
+def _fts5_available() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+# ----------------- STORE -----------------
+
+
+class ResultsStore:
+    """
+    Append-only SQLite store for research results.
+
+    Every ResearchResult becomes one `results` row (theme, run ID, model,
+    timestamp, memo) plus one `concepts` row per Concept, written in a single
+    transaction as soon as the result is saved. Nothing is ever overwritten,
+    so the history of every theme is kept. Problem/solution text is indexed
+    with FTS5 when SQLite supports it, and all queries stream rows from a
+    cursor instead of loading whole runs into memory.
+    """
+
+    def __init__(self, path: str = RESULTS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.fts = _fts5_available()
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        conn = self._connect()
+        try:
+            self._create_schema(conn)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                id            INTEGER PRIMARY KEY,
+                run_id        TEXT,
+                theme         TEXT NOT NULL,
+                model         TEXT NOT NULL,
+                created_at    TEXT NOT NULL,
+                expanded_memo TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_theme ON results(theme, created_at);
+            CREATE INDEX IF NOT EXISTS results_run ON results(run_id);
+
+            CREATE TABLE IF NOT EXISTS concepts (
+                id              INTEGER PRIMARY KEY,
+                result_id       INTEGER NOT NULL REFERENCES results(id),
+                position        INTEGER NOT NULL,
+                theme           TEXT NOT NULL,
+                name            TEXT NOT NULL,
+                problem         TEXT NOT NULL,
+                solution        TEXT NOT NULL,
+                user            TEXT NOT NULL,
+                why_now         TEXT NOT NULL,
+                comparables     TEXT NOT NULL,
+                differentiation TEXT NOT NULL,
+                risks           TEXT NOT NULL,
+                duplicate_of    INTEGER REFERENCES concepts(id)
+            );
+            CREATE INDEX IF NOT EXISTS concepts_result ON concepts(result_id, position);
+            CREATE INDEX IF NOT EXISTS concepts_theme ON concepts(theme);
+
+            -- MinHash signatures (see dedup.py), kept so new runs can be
+            -- checked against the corpus without re-hashing it.
+            CREATE TABLE IF NOT EXISTS concept_signatures (
+                concept_id INTEGER PRIMARY KEY REFERENCES concepts(id),
+                signature  BLOB NOT NULL
+            );
+
+            -- Concept ranking (see ranking.py). Scores and pairwise verdicts
+            -- are memoized per judge key (model + prompt), so re-ranking only
+            -- pays for pairs it has not judged before.
+            CREATE TABLE IF NOT EXISTS concept_scores (
+                judge_key  TEXT NOT NULL,
+                concept_id INTEGER NOT NULL REFERENCES concepts(id),
+                score      REAL NOT NULL,
+                PRIMARY KEY (judge_key, concept_id)
+            );
+            CREATE TABLE IF NOT EXISTS concept_comparisons (
+                judge_key  TEXT NOT NULL,
+                a_id       INTEGER NOT NULL REFERENCES concepts(id),
+                b_id       INTEGER NOT NULL REFERENCES concepts(id),
+                winner_id  INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (judge_key, a_id, b_id)
+            );
+            CREATE TABLE IF NOT EXISTS concept_rankings (
+                scope      TEXT NOT NULL,
+                position   INTEGER NOT NULL,
+                concept_id INTEGER NOT NULL REFERENCES concepts(id),
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (scope, position)
+            );
+            """
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(concepts)")}
+        if "duplicate_of" not in columns:  # stores created before dedup existed
+            conn.execute("ALTER TABLE concepts ADD COLUMN duplicate_of INTEGER REFERENCES concepts(id)")
+        if self.fts:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS concepts_fts USING fts5("
+                "name, problem, solution, content='concepts', content_rowid='id')"
+            )
+        conn.commit()
+
+    # ---- writes ----
+
+    def save_result(
+        self,
+        theme: str,
+        expanded_memo: str,
+        concepts: Iterable[Any],
+        run_id: Optional[str] = None,
+        model: str = "",
+        deduper: Optional[Any] = None,
+    ) -> int:
+        """
+        Appends one result and its concepts; returns the new result ID.
+        `concepts` may be Concept objects or dicts with the Concept fields.
+
+        With a `deduper` (dedup.ConceptDeduper), each concept is checked
+        against the stored corpus before the transaction commits and
+        near-duplicates get `duplicate_of` set to their cluster's canonical
+        concept.
+        """
+        created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock:
+            conn = self._connect()
+            marks: List[Tuple[int, Optional[int], bytes]] = []
+            try:
+                with conn:
+                    cur = conn.execute(
+                        "INSERT INTO results (run_id, theme, model, created_at, expanded_memo) VALUES (?, ?, ?, ?, ?)",
+                        (run_id, theme, model, created_at, expanded_memo),
+                    )
+                    result_id = cur.lastrowid
+                    inserted = []
+                    for position, concept in enumerate(concepts):
+                        inserted.append((self._insert_concept(conn, result_id, position, theme, concept), concept))
+                    if deduper is not None:
+                        marks = deduper.assign(inserted)
+                        self._write_signatures(conn, marks)
+                return result_id
+            except BaseException:
+                if deduper is not None and marks:
+                    deduper.forget(cid for cid, _, _ in marks)
+                raise
+            finally:
+                conn.close()
+
+    def _write_signatures(self, conn: sqlite3.Connection, marks: List[Tuple[int, Optional[int], bytes]]) -> None:
+        conn.executemany("UPDATE concepts SET duplicate_of = ? WHERE id = ?", [(dup, cid) for cid, dup, _ in marks])
+        conn.executemany(
+            "INSERT OR REPLACE INTO concept_signatures (concept_id, signature) VALUES (?, ?)",
+            [(cid, sig) for cid, _, sig in marks],
+        )
+
+    def save_signatures(self, marks: List[Tuple[int, Optional[int], bytes]]) -> None:
+        """
+        Stores (concept_id, duplicate_of, signature) rows from a deduper
+        backfill over existing concepts.
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    self._write_signatures(conn, marks)
+            finally:
+                conn.close()
+
+    def save_scores(self, judge_key: str, scores: Dict[int, float]) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO concept_scores (judge_key, concept_id, score) VALUES (?, ?, ?)",
+                        [(judge_key, cid, score) for cid, score in scores.items()],
+                    )
+            finally:
+                conn.close()
+
+    def save_comparison(self, judge_key: str, a_id: int, b_id: int, winner_id: int) -> None:
+        """
+        Stores one pairwise verdict, with `a_id` the concept shown as "A".
+        """
+        created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO concept_comparisons (judge_key, a_id, b_id, winner_id, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (judge_key, a_id, b_id, winner_id, created_at),
+                    )
+            finally:
+                conn.close()
+
+    def save_ranking(self, scope: str, concept_ids: List[int]) -> None:
+        """
+        Replaces the stored ordering for `scope`, best first.
+        """
+        created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM concept_rankings WHERE scope = ?", (scope,))
+                    conn.executemany(
+                        "INSERT INTO concept_rankings (scope, position, concept_id, created_at) VALUES (?, ?, ?, ?)",
+                        [(scope, i, cid, created_at) for i, cid in enumerate(concept_ids)],
+                    )
+            finally:
+                conn.close()
+
+    def _insert_concept(self, conn: sqlite3.Connection, result_id: int, position: int, theme: str, concept: Any) -> int:
+        d = concept if isinstance(concept, dict) else concept.__dict__
+        values = [str(d.get(f, "") or "") for f in CONCEPT_FIELDS]
+        cur = conn.execute(
+            f"INSERT INTO concepts (result_id, position, theme, {', '.join(CONCEPT_FIELDS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' * len(CONCEPT_FIELDS))})",
+            [result_id, position, theme, *values],
+        )
+        concept_id = cur.lastrowid
+        if self.fts:
+            conn.execute(
+                "INSERT INTO concepts_fts (rowid, name, problem, solution) VALUES (?, ?, ?, ?)",
+                (concept_id, d.get("name", ""), d.get("problem", ""), d.get("solution", "")),
+            )
+        return concept_id
+
+    # ---- reads ----
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> Iterator[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            for row in conn.execute(sql, list(params)):
+                yield dict(row)
+        finally:
+            conn.close()
+
+    def iter_results(self, theme: Optional[str] = None, run_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Result rows (without concepts), oldest first.
+        """
+        where, params = [], []
+        if theme is not None:
+            where.append("theme = ?")
+            params.append(theme)
+        if run_id is not None:
+            where.append("run_id = ?")
+            params.append(run_id)
+        sql = "SELECT * FROM results" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY created_at, id"
+        return self._query(sql, params)
+
+    def iter_signatures(self) -> Iterator[Tuple[int, Optional[int], bytes]]:
+        """
+        (concept_id, duplicate_of, signature) for every signed concept, in
+        insertion order.
+        """
+        for row in self._query(
+            "SELECT s.concept_id, c.duplicate_of, s.signature FROM concept_signatures s "
+            "JOIN concepts c ON c.id = s.concept_id ORDER BY s.concept_id"
+        ):
+            yield row["concept_id"], row["duplicate_of"], row["signature"]
+
+    def concepts_without_signatures(self) -> Iterator[Dict[str, Any]]:
+        return self._query(
+            "SELECT c.* FROM concepts c LEFT JOIN concept_signatures s ON s.concept_id = c.id "
+            "WHERE s.concept_id IS NULL ORDER BY c.id"
+        )
+
+    def concept_names(self, concept_ids: List[int]) -> Dict[int, str]:
+        names: Dict[int, str] = {}
+        for lo in range(0, len(concept_ids), 500):
+            chunk = concept_ids[lo : lo + 500]
+            for row in self._query(f"SELECT id, name FROM concepts WHERE id IN ({', '.join('?' * len(chunk))})", chunk):
+                names[row["id"]] = row["name"]
+        return names
+
+    def concepts_for_result(self, result_id: int) -> List[Dict[str, Any]]:
+        return list(self._query("SELECT * FROM concepts WHERE result_id = ? ORDER BY position", (result_id,)))
+
+    def iter_concepts(self, theme: Optional[str] = None, unique_only: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Concepts for one theme, or across all themes, oldest first.
+        """
+        where, params = [], []
+        if theme is not None:
+            where.append("theme = ?")
+            params.append(theme)
+        if unique_only:
+            where.append("duplicate_of IS NULL")
+        return self._query("SELECT * FROM concepts" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id", params)
+
+    def concepts_for_theme(self, theme: str, unique_only: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        All concepts ever generated for `theme`, across runs, with their run
+        metadata. `unique_only` skips concepts marked as near-duplicates.
+        """
+        return self._query(
+            "SELECT c.*, r.run_id, r.model, r.created_at FROM concepts c JOIN results r ON r.id = c.result_id "
+            "WHERE c.theme = ?" + (" AND c.duplicate_of IS NULL" if unique_only else "") + " "
+            "ORDER BY r.created_at, c.result_id, c.position",
+            (theme,),
+        )
+
+    def search(self, query: str, limit: int = 50) -> Iterator[Dict[str, Any]]:
+        """
+        Full-text search over concept name/problem/solution, best match first.
+        Every whitespace-separated term must match; terms are taken literally,
+        not as FTS5 query syntax. Falls back to a substring match if SQLite
+        lacks FTS5.
+        """
+        if self.fts:
+            return self._query(
+                "SELECT c.*, r.run_id, r.model, r.created_at FROM concepts_fts f "
+                "JOIN concepts c ON c.id = f.rowid JOIN results r ON r.id = c.result_id "
+                "WHERE concepts_fts MATCH ? ORDER BY rank LIMIT ?",
+                (_fts5_terms(query), limit),
+            )
+        like = f"%{query}%"
+        return self._query(
+            "SELECT c.*, r.run_id, r.model, r.created_at FROM concepts c JOIN results r ON r.id = c.result_id "
+            "WHERE c.problem LIKE ? OR c.solution LIKE ? OR c.name LIKE ? LIMIT ?",
+            (like, like, like, limit),
+        )
+
+    def latest_result(self, theme: str) -> Optional[Dict[str, Any]]:
+        """
+        The most recent result for `theme` with its concepts, or None.
+        """
+        rows = list(self._query("SELECT * FROM results WHERE theme = ? ORDER BY created_at DESC, id DESC LIMIT 1", (theme,)))
+        if not rows:
+            return None
+        result = rows[0]
+        result["concepts"] = self.concepts_for_result(result["id"])
+        return result
+
+    def load_scores(self, judge_key: str) -> Dict[int, float]:
+        rows = self._query("SELECT concept_id, score FROM concept_scores WHERE judge_key = ?", (judge_key,))
+        return {r["concept_id"]: r["score"] for r in rows}
+
+    def load_comparisons(self, judge_key: str) -> Dict[Tuple[int, int], int]:
+        """
+        {(concept shown as "A", concept shown as "B"): winner ID} for every memoized verdict.
+        """
+        return {
+            (r["a_id"], r["b_id"]): r["winner_id"]
+            for r in self._query("SELECT a_id, b_id, winner_id FROM concept_comparisons WHERE judge_key = ?", (judge_key,))
+        }
+
+    def load_ranking(self, scope: str) -> List[int]:
+        rows = self._query("SELECT concept_id FROM concept_rankings WHERE scope = ? ORDER BY position", (scope,))
+        return [r["concept_id"] for r in rows]
+
+    def _with_concepts(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        result["concepts"] = [
+            {"id": c["id"], **{f: c[f] for f in CONCEPT_FIELDS}, "duplicate_of": c["duplicate_of"]}
+            for c in self.concepts_for_result(result["id"])
+        ]
+        return result
+
+    def get_result(self, result_id: int) -> Optional[Dict[str, Any]]:
+        """
+        One result with its concepts, in the same shape as export_jsonl lines.
+        """
+        rows = list(self._query("SELECT * FROM results WHERE id = ?", (result_id,)))
+        return self._with_concepts(rows[0]) if rows else None
+
+    def export_jsonl(self, out: IO[str], theme: Optional[str] = None, run_id: Optional[str] = None) -> int:
+        """
+        Writes one JSON line per result (with its concepts) to `out`, one
+        result at a time. Returns the number of results written.
+        """
+        n = 0
+        for result in self.iter_results(theme=theme, run_id=run_id):
+            self._with_concepts(result)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            n += 1
+        return n
+
+
+# ----------------- CLI -----------------
+
+
+def _print_concepts(rows: Iterable[Dict[str, Any]]) -> None:
+    for c in rows:
+        print(f"[{c['created_at']} run={c['run_id']}] {c['theme'][:60]}")
+        dup = f"  (near-duplicate of {c['duplicate_of']})" if c.get("duplicate_of") else ""
+        print(f"  {c['name']}{dup}")
+        print(f"  Problem : {c['problem'][:200]}{'...' if len(c['problem']) > 200 else ''}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the research results store.")
+    parser.add_argument("--db", default=RESULTS_DB_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("runs", help="List stored results.")
+    p.add_argument("--theme")
+    p.add_argument("--run-id")
+
+    p = sub.add_parser("theme", help="All concepts for a theme across runs.")
+    p.add_argument("theme")
+    p.add_argument("--unique", action="store_true", help="Skip concepts marked as near-duplicates.")
+
+    p = sub.add_parser("search", help="Full-text search over concept problem/solution.")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=20)
+
+    p = sub.add_parser("export", help="Export results with concepts as JSONL.")
+    p.add_argument("--theme")
+    p.add_argument("--run-id")
+    p.add_argument("--out", help="Output file (default: stdout).")
+
+    args = parser.parse_args()
+    store = ResultsStore(args.db)
+
+    if args.cmd == "runs":
+        for r in store.iter_results(theme=args.theme, run_id=args.run_id):
+            print(f"{r['id']:>6}  {r['created_at']}  {r['run_id'] or '-':<32} {r['model']:<12} {r['theme'][:60]}")
+    elif args.cmd == "theme":
+        _print_concepts(store.concepts_for_theme(args.theme, unique_only=args.unique))
+    elif args.cmd == "search":
+        _print_concepts(store.search(args.query, limit=args.limit))
+    elif args.cmd == "export":
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                n = store.export_jsonl(f, theme=args.theme, run_id=args.run_id)
+            print(f"Exported {n} results to {args.out}")
+        else:
+            store.export_jsonl(sys.stdout, theme=args.theme, run_id=args.run_id)
+
+
+if __name__ == "__main__":
+    main()
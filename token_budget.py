@@ -0,0 +1,168 @@
+import re
+import functools
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterable
+
+# ----------------- CONFIG -----------------
+
+# Budget for one rendered Prompt 2 (template + memo), in input tokens. Well
+# under every context window: the point is to keep input cost and latency
+# bounded, and to leave room on the smallest fallback model in the tier.
+# Models not listed here (newer or self-hosted ones, Azure deployment names)
+# get no budget unless one is set explicitly.
+MODEL_PROMPT_BUDGETS = {
+    "gpt-4.1": 16_000,
+    "gpt-4.1-mini": 16_000,
+    "gpt-4.1-nano": 12_000,
+    "gpt-4o": 16_000,
+    "gpt-4o-mini": 12_000,
+}
+MIN_MEMO_TOKENS = 2_000  # a budget leaving the memo less than this is not applied
+
+CHARS_PER_TOKEN = 4  # fallback estimate when tiktoken is unavailable
+MIN_SUMMARIZE_TOKENS = 150  # sections smaller than this are never summarized
+MIN_KEEP_RATIO = 0.25  # a summarized section keeps at least this share of its tokens
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+\S", re.MULTILINE)
+_MD_LINK_RE = re.compile(r"\[([^\]]*)\]\((?:https?://|www\.)[^)\s]*\)")
+_CITATION_RE = re.compile(r"\s*\(\s*\[[^\]]*\]\([^)]*\)(?:\s*[,;]\s*\[[^\]]*\]\([^)]*\))*\s*\)")
+_BARE_URL_RE = re.compile(r"\s*\(?<?https?://[^\s)>]*[^\s)>.,;:]>?\)?")
+_RULE_RE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$", re.MULTILINE)
+_SOURCES_HEADING_RE = re.compile(r"^#{1,6}\s+(sources|references|citations|further reading)\b", re.IGNORECASE)
+
+
+# ----------------- TOKEN COUNTING -----------------
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str) -> Optional[Any]:
+    """
+    tiktoken encoding for `model`, or None if tiktoken is not installed or
+    its encoding files cannot be loaded (they are downloaded on first use).
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:  # model newer than this tiktoken release
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+
+
+def prompt_budget(models: Iterable[str]) -> Optional[int]:
+    """
+    Token budget that fits every model a call may be routed to, i.e. the
+    smallest budget among them, or None if none of them has one. Dated
+    snapshots ("gpt-4.1-2025-04-14") use their base model's budget.
+    """
+    budgets = []
+    for model in models:
+        budget = MODEL_PROMPT_BUDGETS.get(model)
+        if budget is None:
+            budget = next(
+                (b for m, b in sorted(MODEL_PROMPT_BUDGETS.items(), key=lambda kv: -len(kv[0])) if model.startswith(m)),
+                None,
+            )
+        if budget is not None:
+            budgets.append(budget)
+    return min(budgets) if budgets else None
+
+
+# ----------------- MEMO SECTIONS -----------------
+
+
+@dataclass
+class MemoSection:
+    heading: str  # the heading line, "" for text before the first heading
+    body: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.heading}\n{self.body}" if self.heading else self.body
+
+
+def split_memo_sections(memo: str) -> List[MemoSection]:
+    """
+    Splits a markdown memo at its heading lines; text before the first
+    heading becomes a section with an empty heading.
+    """
+    sections: List[MemoSection] = []
+    heading = ""
+    body: List[str] = []
+    for line in memo.split("\n"):
+        if _HEADING_RE.match(line):
+            if heading or body:
+                sections.append(MemoSection(heading, "\n".join(body)))
+            heading, body = line, []
+        else:
+            body.append(line)
+    sections.append(MemoSection(heading, "\n".join(body)))
+    return sections
+
+
+def join_memo_sections(sections: List[MemoSection]) -> str:
+    return "\n".join(s.text for s in sections)
+
+
+# ----------------- COMPRESSION -----------------
+
+
+def trim_boilerplate(text: str) -> str:
+    """
+    Deterministic trimming of text Prompt 2 has no use for: inline
+    web-search citations and URLs (link text is kept), horizontal rules,
+    trailing whitespace and runs of blank lines.
+    """
+    text = _CITATION_RE.sub("", text)
+    text = _MD_LINK_RE.sub(r"\1", text)
+    text = _BARE_URL_RE.sub("", text)
+    text = _RULE_RE.sub("", text)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def trim_sections(sections: List[MemoSection]) -> List[MemoSection]:
+    """
+    trim_boilerplate on every section; source lists are dropped entirely.
+    """
+    return [
+        MemoSection(s.heading, trim_boilerplate(s.body))
+        for s in sections
+        if not _SOURCES_HEADING_RE.match(s.heading)
+    ]
+
+
+def summarize_targets(section_tokens: List[int], over_by: int) -> Dict[int, int]:
+    """
+    Which sections to summarize, and each one's target size in tokens, to
+    remove `over_by` tokens. Only sections of at least MIN_SUMMARIZE_TOKENS
+    are touched, all shrunk by the same ratio (never below MIN_KEEP_RATIO).
+    """
+    candidates = {i: n for i, n in enumerate(section_tokens) if n >= MIN_SUMMARIZE_TOKENS}
+    total = sum(candidates.values())
+    if over_by <= 0 or not total:
+        return {}
+    ratio = max(MIN_KEEP_RATIO, (total - over_by) / total)
+    return {i: max(1, int(n * ratio)) for i, n in candidates.items()}
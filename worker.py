@@ -0,0 +1,500 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from dotenv import load_dotenv
+
+import research
+from checkpoints import new_run_id
+from instrumentation import tracer
+from results_store import ResultsStore, RESULTS_DB_PATH
+
+# ----------------- CONFIG -----------------
+
+QUEUE_DB_PATH = os.getenv("RESEARCH_QUEUE_DB", "research_queue.sqlite3")
+WORKER_HOST = "127.0.0.1"  # local only: the API has no authentication
+WORKER_PORT = int(os.getenv("RESEARCH_WORKER_PORT", "8321"))
+WORKER_CONCURRENCY = 4  # jobs in flight at once
+POLL_INTERVAL_S = 5.0  # idle workers re-check the queue this often even without a wake-up
+TRACE_SPANS_KEPT = 10_000  # the daemon runs indefinitely; keep only recent spans in memory
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# ----------------- JOB QUEUE -----------------
+
+
+class JobQueue:
+    """
+    Persistent SQLite priority queue of research jobs.
+
+    Jobs are claimed highest priority first, then in submission order. A
+    claim flips the job to "running" inside an IMMEDIATE transaction, so two
+    workers never get the same job. Jobs still "running" when the process
+    stopped are put back in the queue by requeue_running(); each job is
+    checkpointed under its own ID, so a requeued job resumes from its last
+    completed stage.
+    """
+
+    def __init__(self, path: str = QUEUE_DB_PATH):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    seq         INTEGER PRIMARY KEY,
+                    id          TEXT NOT NULL UNIQUE,
+                    theme       TEXT NOT NULL,
+                    priority    INTEGER NOT NULL DEFAULT 0,
+                    status      TEXT NOT NULL,
+                    created_at  TEXT NOT NULL,
+                    started_at  TEXT,
+                    finished_at TEXT,
+                    attempts    INTEGER NOT NULL DEFAULT 0,
+                    result_id   INTEGER,
+                    error       TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(status, priority DESC, seq);
+                """
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _execute(self, sql: str, params: Tuple[Any, ...] = ()) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job.pop("seq", None)
+        return job
+
+    def submit(self, theme: str, priority: int = 0) -> Dict[str, Any]:
+        job_id = new_run_id()
+        self._execute(
+            "INSERT INTO jobs (id, theme, priority, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, theme, priority, _now()),
+        )
+        job = self.get(job_id)
+        assert job is not None
+        return job
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Marks the next queued job as running and returns it, or None if the
+        queue is empty.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT seq FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, error = NULL WHERE seq = ?",
+                (_now(), row["seq"]),
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE seq = ?", (row["seq"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._job(job)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def finish(self, job_id: str, result_id: int) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, result_id = ? WHERE id = ?",
+            (_now(), result_id, job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+            (_now(), error, job_id),
+        )
+
+    def requeue_running(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._job(row) if row is not None else None
+        finally:
+            conn.close()
+
+    def recent(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Most recently submitted jobs first.
+        """
+        conn = self._connect()
+        try:
+            if status is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY seq DESC LIMIT ?", (limit,))
+            else:
+                rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY seq DESC LIMIT ?", (status, limit))
+            return [self._job(r) for r in rows]
+        finally:
+            conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+                counts[row["status"]] = row["n"]
+            return counts
+        finally:
+            conn.close()
+
+
+# ----------------- WORKER POOL -----------------
+
+
+class ResearchWorker:
+    """
+    Runs queued jobs with `concurrency` async workers on one long-lived event
+    loop thread.
+
+    Because the loop lives as long as the process, every provider's
+    AsyncOpenAI client (and its HTTP connection pool) is built once and
+    reused by every job, instead of paying interpreter start-up, .env
+    loading, client construction and new TLS connections per theme. Results
+    go to the results store exactly as in batch mode; the job row keeps the
+    result ID.
+    """
+
+    def __init__(self, queue: JobQueue, store: ResultsStore, concurrency: int = WORKER_CONCURRENCY, dedup: bool = True):
+        self.queue = queue
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.dedup = dedup
+        self.deduper: Optional[Any] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="research-worker", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops taking jobs and cancels the ones in flight; they are requeued
+        and resume from their checkpoints on the next start.
+        """
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.queue.requeue_running()
+
+    def notify(self) -> None:
+        """
+        Wakes idle workers after a submit (callable from any thread).
+        """
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} job(s) interrupted by the last shutdown.")
+        self.deduper = await asyncio.to_thread(research._load_deduper, self.store) if self.dedup else None
+        research.get_providers()  # build clients up front rather than on the first job
+        self._ready.set()
+
+        workers = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+        await self._stop.wait()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _work(self) -> None:
+        assert self._wake is not None
+        while True:
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        label = research._theme_label(job["theme"])
+        print(f"[{label}] job {job['id']} started (attempt {job['attempts']}).")
+        try:
+            result = await research.run_research_for_oz_async(job["theme"], run_id=job["id"])
+            # A job interrupted after saving but before being marked done
+            # resumes from its checkpoints; save_result returns the result
+            # already stored under its ID rather than storing it twice.
+            result_id = await asyncio.to_thread(research.save_result, self.store, result, job["id"], self.deduper)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[{label}] job {job['id']} FAILED: {e}")
+            await asyncio.to_thread(self.queue.fail, job["id"], f"{type(e).__name__}: {e}")
+            return
+        await asyncio.to_thread(self.queue.finish, job["id"], result_id)
+        print(f"[{label}] job {job['id']} done (result {result_id}).")
+
+
+# ----------------- HTTP API -----------------
+
+
+class WorkerServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], worker: ResearchWorker):
+        super().__init__(address, WorkerHandler)
+        self.worker = worker
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class WorkerHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs               {"theme": "...", "priority": 0} -> 202 job
+    GET  /jobs[?status=...]  recent jobs and per-status counts
+    GET  /jobs/<id>          job status
+    GET  /jobs/<id>/result   the stored result with its concepts (409 until done)
+    GET  /health             queue counts
+    """
+
+    server: WorkerServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # the worker prints its own progress
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    def do_POST(self) -> None:
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            self._error(404, f"unknown path {self.path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            theme = body.get("theme") if isinstance(body, dict) else None
+            priority = int(body.get("priority", 0)) if isinstance(body, dict) else 0
+        except (ValueError, TypeError):
+            self._error(400, "expected a JSON object with a 'theme' string and optional integer 'priority'")
+            return
+        if not isinstance(theme, str) or not theme.strip():
+            self._error(400, "'theme' must be a non-empty string")
+            return
+
+        job = self.server.worker.queue.submit(theme.strip(), priority)
+        self.server.worker.notify()
+        self._send_json(202, job)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        queue = self.server.worker.queue
+
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "workers": self.server.worker.concurrency, "counts": queue.counts()})
+            return
+        if path == "/jobs":
+            params = parse_qs(url.query)
+            status = params.get("status", [None])[0]
+            if status is not None and status not in JOB_STATUSES:
+                self._error(400, f"status must be one of {', '.join(JOB_STATUSES)}")
+                return
+            try:
+                limit = int(params.get("limit", ["50"])[0])
+            except ValueError:
+                self._error(400, "limit must be an integer")
+                return
+            self._send_json(200, {"jobs": queue.recent(status, limit), "counts": queue.counts()})
+            return
+
+        m = re.fullmatch(r"/jobs/([^/]+)(/result)?", path)
+        if not m:
+            self._error(404, f"unknown path {self.path}")
+            return
+        job = queue.get(m.group(1))
+        if job is None:
+            self._error(404, f"no job {m.group(1)}")
+            return
+        if not m.group(2):
+            self._send_json(200, job)
+            return
+        if job["status"] != "done":
+            self._send_json(409, {"error": f"job is {job['status']}", "job": job})
+            return
+        result = self.server.worker.store.get_result(job["result_id"])
+        if result is None:
+            self._error(404, f"result {job['result_id']} is missing from the results store")
+            return
+        self._send_json(200, result)
+
+
+def serve(
+    host: str = WORKER_HOST,
+    port: int = WORKER_PORT,
+    concurrency: int = WORKER_CONCURRENCY,
+    queue_path: str = QUEUE_DB_PATH,
+    results_db: str = RESULTS_DB_PATH,
+    dedup: bool = True,
+) -> None:
+    """
+    Runs the worker pool and HTTP API until interrupted.
+    """
+    tracer.set_max_spans(TRACE_SPANS_KEPT)
+    worker = ResearchWorker(JobQueue(queue_path), ResultsStore(results_db), concurrency, dedup)
+    worker.start()
+    server = WorkerServer((host, port), worker)
+    counts = worker.queue.counts()
+    print(
+        f"Research worker listening on {server.base_url} with {worker.concurrency} workers "
+        f"({counts['queued']} job(s) queued)."
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Shutting down; in-flight jobs will resume on the next start.")
+        server.server_close()
+        worker.stop(timeout=10)
+
+
+# ----------------- CLI -----------------
+
+
+def _request(base_url: str, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running research worker with a local HTTP/JSON job API.")
+    parser.add_argument("--url", default=f"http://{WORKER_HOST}:{WORKER_PORT}", help="Worker API for the client commands.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("serve", help="Run the worker pool and HTTP API.")
+    p.add_argument("--host", default=WORKER_HOST)
+    p.add_argument("--port", type=int, default=WORKER_PORT)
+    p.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    p.add_argument("--queue-db", default=QUEUE_DB_PATH)
+    p.add_argument("--results-db", default=RESULTS_DB_PATH)
+    p.add_argument("--no-dedup", action="store_true")
+    p.add_argument("--prompt-2-mode", choices=research.PROMPT_2_MODES, default=research.PROMPT_2_MODE)
+    p.add_argument(
+        "--providers",
+        metavar="FILE",
+        help="JSON file of provider tiers (default: RESEARCH_PROVIDERS, read after .env is loaded).",
+    )
+    p.add_argument("--no-hedge", action="store_true", help="Don't send backup requests for slow calls.")
+    p.add_argument("--trace", metavar="FILE", help="Append per-stage / per-theme spans to this JSONL file.")
+
+    p = sub.add_parser("submit", help="Queue a theme.")
+    p.add_argument("theme")
+    p.add_argument("--priority", type=int, default=0, help="Higher runs first.")
+
+    p = sub.add_parser("status", help="Show a job, or recent jobs if no ID is given.")
+    p.add_argument("job_id", nargs="?")
+
+    p = sub.add_parser("result", help="Print a finished job's result as JSON.")
+    p.add_argument("job_id")
+    p.add_argument("--wait", action="store_true", help="Poll until the job finishes.")
+
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        load_dotenv()  # before anything reads RESEARCH_PROVIDERS
+        research.PROMPT_2_MODE = args.prompt_2_mode
+        providers_path = args.providers or os.getenv("RESEARCH_PROVIDERS")
+        research.set_providers(
+            research.ProviderRouter(research.provider_tiers(providers_path), hedge=not args.no_hedge)
+        )
+        tracer.path = args.trace
+        serve(args.host, args.port, args.concurrency, args.queue_db, args.results_db, dedup=not args.no_dedup)
+        return
+
+    if args.cmd == "submit":
+        status, body = _request(args.url, "POST", "/jobs", {"theme": args.theme, "priority": args.priority})
+    elif args.cmd == "status":
+        status, body = _request(args.url, "GET", f"/jobs/{args.job_id}" if args.job_id else "/jobs")
+    else:
+        while True:
+            status, body = _request(args.url, "GET", f"/jobs/{args.job_id}/result")
+            if not (args.wait and status == 409 and body.get("job", {}).get("status") in ("queued", "running")):
+                break
+            time.sleep(POLL_INTERVAL_S)
+    print(json.dumps(body, indent=2, ensure_ascii=False))
+    if status >= 400:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()